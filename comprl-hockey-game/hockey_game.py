@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import typing
-from dataclasses import asdict, dataclass, field
+from dataclasses import dataclass
 
 import hockey.hockey_env as h_env  # type: ignore[import-untyped]
 import numpy as np
@@ -14,11 +14,34 @@ if typing.TYPE_CHECKING:
 
 @dataclass
 class RoundData:
-    """data class to store the data of a round"""
+    """data class to store the data of a round
+
+    The buffers are preallocated for the maximum length of a round.  ``n`` is the
+    number of steps recorded so far.  There is always one observation more than there
+    are actions/rewards, as the initial observation after reset is stored as well.
+    """
+
+    actions: np.ndarray
+    observations: np.ndarray
+    rewards: np.ndarray
+    n: int = 0
+
+    @classmethod
+    def allocate(cls, max_steps: int, obs_dim: int, action_dim: int) -> RoundData:
+        """create a RoundData instance with buffers for up to max_steps steps"""
+        return cls(
+            actions=np.empty((max_steps, action_dim)),
+            observations=np.empty((max_steps + 1, obs_dim)),
+            rewards=np.empty(max_steps),
+        )
 
-    actions: list[np.ndarray] = field(default_factory=list)
-    observations: list[np.ndarray] = field(default_factory=list)
-    rewards: list[float] = field(default_factory=list)
+    def to_dict(self) -> dict[str, np.ndarray]:
+        """return the recorded part of the buffers"""
+        return {
+            "actions": self.actions[: self.n],
+            "observations": self.observations[: self.n + 1],
+            "rewards": self.rewards[: self.n],
+        }
 
 
 class HockeyGame(IGame):
@@ -44,8 +67,13 @@ class HockeyGame(IGame):
         # Bool if all rounds are finished
         self.finished = False
 
+        # size of the per-round buffers (queried once, they don't change between rounds)
+        self._max_steps: int = self.env.max_timesteps
+        self._obs_dim: int = self.env.observation_space.shape[0]
+        self._action_dim: int = self.env.action_space.shape[0]
+
         # array storing all actions/observations/... of a round to be saved later.
-        self.round_data = RoundData()
+        self.round_data = self._new_round_data()
 
         super().__init__(players)
 
@@ -61,9 +89,20 @@ class HockeyGame(IGame):
         """
 
         self.obs_player_one, _ = self.env.reset()
-        self.round_data.observations.append(self.obs_player_one)
+        self.round_data.observations[0] = self.obs_player_one
+        self._cache_observations()
         return super().start()
 
+    def _cache_observations(self) -> None:
+        """convert the observations of both players to lists once per step"""
+        # obs is an np array, but the players need a list
+        self._obs_p1_list: list[float] = self.obs_player_one.tolist()
+        self._obs_p2_list: list[float] = self.env.obs_agent_two().tolist()
+
+    def _new_round_data(self) -> RoundData:
+        """allocate the buffers for a new round"""
+        return RoundData.allocate(self._max_steps, self._obs_dim, self._action_dim)
+
     def _end(self, reason="unknown"):
         """notifies all players that the game has ended
 
@@ -82,25 +121,21 @@ class HockeyGame(IGame):
         """
         # self.env.render(mode="human")  # (un)comment to render or not
 
-        combined_action = np.hstack(
-            [
-                actions_dict[self.player_1_id][:4],
-                actions_dict[self.player_2_id][:4],
-            ]
-        )
-        # TODO: do these variables actually need to be class variables?
-        (
-            self.obs_player_one,
-            reward,
-            terminated,
-            truncated,
-            info,
-        ) = self.env.step(combined_action)
-
-        # store the actions and observations
-        self.round_data.actions.append(combined_action)
-        self.round_data.observations.append(self.obs_player_one)
-        self.round_data.rewards.append(reward)
+        # Write the combined action directly into the preallocated round buffer.  Each
+        # step uses a separate row, so the env never sees a reused array.
+        rd = self.round_data
+        combined_action = rd.actions[rd.n]
+        combined_action[:4] = actions_dict[self.player_1_id][:4]
+        combined_action[4:] = actions_dict[self.player_2_id][:4]
+
+        obs, reward, terminated, truncated, info = self.env.step(combined_action)
+        # only the observation is needed outside of this method
+        self.obs_player_one = obs
+
+        # store the observations (the action is already in the buffer)
+        rd.observations[rd.n + 1] = obs
+        rd.rewards[rd.n] = reward
+        rd.n += 1
 
         # check if current round has ended
         if terminated or truncated:
@@ -112,7 +147,7 @@ class HockeyGame(IGame):
 
             # store the data of this round
             self.game_info["rounds"].append(
-                asdict(self.round_data)
+                self.round_data.to_dict()
                 | {
                     "score": (
                         self.scores[self.player_1_id],
@@ -122,9 +157,9 @@ class HockeyGame(IGame):
             )
 
             # reset env
-            self.round_data = RoundData()
-            self.obs_player_one, info = self.env.reset()
-            self.round_data.observations.append(self.obs_player_one)
+            self.round_data = self._new_round_data()
+            self.obs_player_one, _ = self.env.reset()
+            self.round_data.observations[0] = self.obs_player_one
 
             # DISABLED: swap player side, swap player ids
             # Did not seem to be implemented correctly, was it? The game swaps sides that start anyway.
@@ -138,6 +173,8 @@ class HockeyGame(IGame):
             if self.remaining_rounds <= 0:
                 self.finished = True
 
+        self._cache_observations()
+
         return self.finished
 
     def _validate_action(self, action) -> bool:
@@ -145,11 +182,14 @@ class HockeyGame(IGame):
         # can't use self.env.action_space.contains as this is a action of one player
         # and the action space is for both players. So I basically copied the code from
         # the contains() function.
-        action = np.array(action)
-        return bool(
-            action.shape == (4,) and np.all(action >= -1) and np.all(action <= 1)
-        )
-        # check if the action is in the action space and thus valid
+        # As it is only four values, plain Python comparisons are much cheaper than
+        # converting to a NumPy array.
+        try:
+            a, b, c, d = action
+            return bool(-1 <= a <= 1 and -1 <= b <= 1 and -1 <= c <= 1 and -1 <= d <= 1)
+        except (ValueError, TypeError):
+            # wrong number of elements or elements that are not numbers
+            return False
 
     def _get_observation(self, id: PlayerID) -> list[float]:
         """return the correct obs respecting if sides are swapped
@@ -158,9 +198,9 @@ class HockeyGame(IGame):
 
         Returns: list[float]: observation of the player with the given id"""
         if id == self.player_1_id:
-            return self.obs_player_one.tolist()  # obs is an np array, we need list
+            return self._obs_p1_list
         else:
-            return self.env.obs_agent_two().tolist()  # obs is an np array, we need list
+            return self._obs_p2_list
 
     def _player_won(self, id: PlayerID) -> bool:
         """check if a player has won the game
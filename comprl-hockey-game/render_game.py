@@ -5,6 +5,7 @@ from __future__ import annotations
 
 import argparse
 import contextlib
+import functools
 import logging
 import pathlib
 import pickle
@@ -18,6 +19,22 @@ import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 from hockey.hockey_env import HockeyEnv  # type: ignore[import-untyped]
 
+FONT_FILE = pathlib.Path(__file__).parent / "f2-tecnocratica-ffp.ttf"
+RED = (235, 98, 53)
+BLUE = (93, 158, 199)
+SCOREBOARD_HEIGHT = 28
+
+# writer options for the supported video codecs (see --codec)
+VIDEO_CODEC_OPTIONS: dict[str, dict] = {
+    "libx264": {
+        "codec": "libx264",
+        "quality": None,
+        "pixelformat": "yuv420p",
+        "ffmpeg_params": ["-crf", "20", "-preset", "veryfast"],
+    },
+    "mjpeg": {"codec": "mjpeg", "quality": 10, "pixelformat": "yuvj444p"},
+}
+
 
 class GameInfo(NamedTuple):
     round: int
@@ -27,38 +44,80 @@ class GameInfo(NamedTuple):
     score2: int
 
 
+@functools.lru_cache(maxsize=1)
+def _get_bgr_buffer(shape: tuple[int, ...]) -> np.ndarray:
+    """Get the scratch buffer used for the RGB->BGR conversion of displayed frames."""
+    return np.empty(shape, dtype=np.uint8)
+
+
+def show_frame(img: np.ndarray, wait_ms: int) -> None:
+    """Show the given RGB frame in the "Game" window and wait for ``wait_ms`` ms.
+
+    OpenCV expects BGR, so the frame has to be converted.  The conversion writes into
+    a preallocated buffer instead of allocating a new image for every frame.
+    """
+    bgr = _get_bgr_buffer(img.shape)
+    cv2.cvtColor(img, cv2.COLOR_RGB2BGR, dst=bgr)
+    cv2.imshow("Game", bgr)
+    cv2.waitKey(wait_ms)
+
+
+def hold_frame(
+    img: np.ndarray,
+    n_frames: int,
+    rate_ms: int,
+    show: bool,
+    video_writer: imageio.core.Format.Writer | None,
+) -> None:
+    """Keep showing the same image for ``n_frames`` frames.
+
+    The video needs every frame, but for the window it is enough to show the image once
+    and then wait for the whole duration.
+    """
+    if video_writer is not None:
+        for _ in range(n_frames):
+            video_writer.append_data(img)
+    if show:
+        show_frame(img, rate_ms * n_frames)
+
+
 def playback_round(
     env: HockeyEnv,
     observations: Sequence[np.ndarray],
     fps: float,
     game_info: GameInfo,
     show: bool,
-) -> list[np.ndarray]:
-    frames = []
+    video_writer: imageio.core.Format.Writer | None = None,
+) -> None:
+    """Play back one round.
+
+    Frames are shown in a window (if ``show`` is set) and/or directly written to
+    ``video_writer`` (if given), so they never have to be kept in memory.
+    """
     rate_ms = int(1 / fps * 1000)
     env.reset()
 
     # Show the first frame with annotation of the round for a second
     first_obs = observations[0]
     env.set_state(first_obs)
-    img = np.array(render(env, game_info, center_text=f"Round {game_info.round}"))
-    for _ in range(int(fps)):
-        frames.append(img)
-        if show:
-            cv2.imshow("Game", cv2.cvtColor(img, cv2.COLOR_RGB2BGR))
-            cv2.waitKey(rate_ms)
+    img = render(env, game_info, center_text=f"Round {game_info.round}")
+    hold_frame(img, int(fps), rate_ms, show, video_writer)
 
+    # consecutive observations are sometimes identical (e.g. while the puck is held), in
+    # which case the previous frame can be reused instead of rendering it again
+    last_observation_bytes = None
     t_start = time.monotonic()
     for observation in observations:
-        env.set_state(observation)
-        img = np.array(render(env, game_info))
-        frames.append(img)
+        observation_bytes = observation.tobytes()
+        if observation_bytes != last_observation_bytes:
+            env.set_state(observation)
+            img = render(env, game_info)
+            last_observation_bytes = observation_bytes
+        if video_writer is not None:
+            video_writer.append_data(img)
         if show:
-            cv2.imshow("Game", cv2.cvtColor(img, cv2.COLOR_RGB2BGR))
             duration = max(1, int(rate_ms - (time.monotonic() - t_start) * 1000))
-            cv2.waitKey(duration)
-
-    return frames
+            show_frame(img, duration)
 
 
 def playback_final_result(
@@ -67,8 +126,12 @@ def playback_final_result(
     fps: float,
     game_info: GameInfo,
     show: bool,
-) -> list[np.ndarray]:
-    frames = []
+    video_writer: imageio.core.Format.Writer | None = None,
+) -> None:
+    """Show the final frame with the result for two seconds.
+
+    See :func:`playback_round` for the meaning of ``show`` and ``video_writer``.
+    """
     rate_ms = int(1 / fps * 1000)
     env.reset()
 
@@ -80,30 +143,31 @@ def playback_final_result(
         result = f"{game_info.player2} wins"
 
     env.set_state(final_observation)
-    img = np.array(render(env, game_info, center_text=result))
-    for _ in range(int(fps * 2)):
-        frames.append(img)
-        if show:
-            cv2.imshow("Game", cv2.cvtColor(img, cv2.COLOR_RGB2BGR))
-            cv2.waitKey(rate_ms)
+    img = render(env, game_info, center_text=result)
+    hold_frame(img, int(fps * 2), rate_ms, show, video_writer)
 
-    return frames
 
+@functools.lru_cache(maxsize=4)
+def _get_font(size: int) -> ImageFont.FreeTypeFont:
+    """Load the font in the given size (cached, so the file is only parsed once)."""
+    return ImageFont.truetype(FONT_FILE, size)
 
-def render(
-    env: HockeyEnv,
-    game_info: GameInfo,
-    center_text: str | None = None,
-) -> Image.Image:
-    red = (235, 98, 53)
-    blue = (93, 158, 199)
 
-    frame = env.render(mode="rgb_array")
-    img = Image.fromarray(frame)
-    draw = ImageDraw.Draw(img)
+@functools.lru_cache(maxsize=8)
+def _build_overlay(width: int, game_info: GameInfo) -> tuple[np.ndarray, np.ndarray]:
+    """Render the scoreboard (player names and score) on a transparent image.
 
-    font_file = pathlib.Path(__file__).parent / "f2-tecnocratica-ffp.ttf"
-    font = ImageFont.truetype(font_file, 24)
+    The scoreboard only changes between rounds, so it is rendered once and then blended
+    onto every frame with :func:`_alpha_blit`.
+
+    Returns:
+        Tuple ``(premultiplied_rgb, inverse_alpha)`` as prepared for
+        :func:`_alpha_blit`.
+    """
+    # leave some space below the bar for descenders of the text
+    img = Image.new("RGBA", (width, 2 * SCOREBOARD_HEIGHT), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    font = _get_font(24)
 
     player_left = game_info.player1
     player_right = game_info.player2
@@ -111,12 +175,12 @@ def render(
     score_right = game_info.score2
 
     text_offset = 15
-    draw.rectangle((0, 0, img.width, 28), fill=(100, 100, 100))
-    draw.text((text_offset, 0), player_left[:25], red, font=font)
+    draw.rectangle((0, 0, width, SCOREBOARD_HEIGHT), fill=(100, 100, 100))
+    draw.text((text_offset, 0), player_left[:25], RED, font=font)
     draw.text(
-        (img.width - text_offset, 0),
+        (width - text_offset, 0),
         player_right[:25],
-        blue,
+        BLUE,
         font=font,
         align="right",
         anchor="ra",
@@ -124,33 +188,64 @@ def render(
 
     if game_info.score1 is not None and game_info.score2 is not None:
         score_center_offset = 5
-        draw.text((img.width / 2, 0), ":", (200, 200, 200), font=font, anchor="ma")
+        draw.text((width / 2, 0), ":", (200, 200, 200), font=font, anchor="ma")
         draw.text(
-            (img.width / 2 - score_center_offset, 0),
+            (width / 2 - score_center_offset, 0),
             str(score_left),
-            red,
+            RED,
             font=font,
             anchor="ra",
         )
         draw.text(
-            (img.width / 2 + score_center_offset, 0),
+            (width / 2 + score_center_offset, 0),
             str(score_right),
-            blue,
+            BLUE,
             font=font,
             anchor="la",
         )
 
+    rgba = np.asarray(img, dtype=np.uint16)
+    alpha = rgba[..., 3:]
+    # +128 is the rounding offset of the division in _alpha_blit
+    return rgba[..., :3] * alpha + 128, 255 - alpha
+
+
+def _alpha_blit(frame: np.ndarray, overlay: tuple[np.ndarray, np.ndarray]) -> None:
+    """Blend the overlay from :func:`_build_overlay` onto the top of frame, in place.
+
+    Uses the same integer arithmetic as PIL's ``Image.paste`` with an alpha mask, i.e.
+    ``(src * a + dst * (255 - a)) / 255`` with rounding.  All intermediate values fit in
+    uint16.
+    """
+    premultiplied_rgb, inverse_alpha = overlay
+    region = frame[: premultiplied_rgb.shape[0]]
+    v = region * inverse_alpha + premultiplied_rgb
+    region[...] = ((v >> 8) + v) >> 8
+
+
+def render(
+    env: HockeyEnv,
+    game_info: GameInfo,
+    center_text: str | None = None,
+) -> np.ndarray:
+    frame = np.ascontiguousarray(env.render(mode="rgb_array"))
+    _alpha_blit(frame, _build_overlay(frame.shape[1], game_info))
+
+    # the center text is only shown on a few frames that are rendered once per round,
+    # so it is fine to go through PIL here (cv2.putText cannot use the TrueType font)
     if center_text:
-        font = ImageFont.truetype(font_file, 50)
+        img = Image.fromarray(frame)
+        draw = ImageDraw.Draw(img)
         draw.text(
             (img.width / 2, img.height / 2),
             center_text,
             (19, 19, 19),
-            font=font,
+            font=_get_font(50),
             anchor="mm",
         )
+        frame = np.asarray(img)
 
-    return img
+    return frame
 
 
 def main() -> int:
@@ -163,6 +258,13 @@ def main() -> int:
         metavar="dest",
         help="Save as MP4 video to the specified path.",
     )
+    parser.add_argument(
+        "--codec",
+        choices=VIDEO_CODEC_OPTIONS.keys(),
+        default="libx264",
+        help="""Video codec used with --save-video.  H.264 (libx264) results in much
+            smaller files than MJPEG.  Default: %(default)s.""",
+    )
     parser.add_argument(
         "--verbose", "-v", action="store_true", help="Enable verbose output."
     )
@@ -182,47 +284,47 @@ def main() -> int:
 
     env = HockeyEnv()
 
-    frames = []
-    game_info = GameInfo(1, data["user_names"][0], data["user_names"][1], 0, 0)
-    for i, round_ in enumerate(data["rounds"]):
-        frames += playback_round(
+    # Frames are written to the video while they are rendered.  Without --save-video,
+    # nullcontext provides `None` as writer, so frames are only shown.
+    video_writer: contextlib.AbstractContextManager
+    if args.save_video:
+        video_writer = imageio.get_writer(
+            args.save_video, fps=args.fps, **VIDEO_CODEC_OPTIONS[args.codec]
+        )
+    else:
+        video_writer = contextlib.nullcontext()
+
+    with video_writer as video:
+        game_info = GameInfo(1, data["user_names"][0], data["user_names"][1], 0, 0)
+        for i, round_ in enumerate(data["rounds"]):
+            playback_round(
+                env,
+                round_["observations"],
+                args.fps,
+                game_info,
+                show=not args.save_video,
+                video_writer=video,
+            )
+            time.sleep(1)
+
+            # update game info for next round
+            game_info = GameInfo(
+                i + 2,
+                data["user_names"][0],
+                data["user_names"][1],
+                int(round_["score"][0]),
+                int(round_["score"][1]),
+            )
+
+        # show last frame with the final score
+        playback_final_result(
             env,
-            round_["observations"],
+            round_["observations"][-1],
             args.fps,
             game_info,
             show=not args.save_video,
+            video_writer=video,
         )
-        time.sleep(1)
-
-        # update game info for next round
-        game_info = GameInfo(
-            i + 2,
-            data["user_names"][0],
-            data["user_names"][1],
-            int(round_["score"][0]),
-            int(round_["score"][1]),
-        )
-
-    # show last frame with the final score
-    frames += playback_final_result(
-        env,
-        round_["observations"][-1],
-        args.fps,
-        game_info,
-        show=not args.save_video,
-    )
-
-    if args.save_video:
-        video = imageio.get_writer(
-            args.save_video,
-            fps=args.fps,
-            codec="mjpeg",
-            quality=10,
-            pixelformat="yuvj444p",
-        )
-        for frame in frames:
-            video.append_data(frame)
-        video.close()
 
     return 0
 
@@ -9,6 +9,7 @@ import itertools
 import logging
 import pathlib
 import sys
+from collections.abc import Sequence
 
 import sqlalchemy as sa
 
@@ -16,20 +17,43 @@ from comprl.server.data.sql_backend import Game, User
 from comprl.server.interfaces import GameEndState
 
 
-def pick_game(session: sa.orm.Session, user1: User, user2: User) -> Game | None:
-    stmt = (
-        sa.select(Game)
+def pick_games(
+    session: sa.orm.Session, users: Sequence[User]
+) -> dict[tuple[int, int], str]:
+    """Pick one random game for each pair of the given users.
+
+    This is done in a single query, partitioning the games by the (unordered) pair of
+    players and selecting one random game per partition.
+
+    Returns:
+        Mapping of ``(min(user_id), max(user_id))`` to the game ID of the selected game.
+        Pairs that did not play against each other are not included.
+    """
+    user_ids = [user.user_id for user in users]
+    # SQLite's multi-argument min/max are the scalar LEAST/GREATEST
+    low = sa.func.min(Game.user1, Game.user2)
+    high = sa.func.max(Game.user1, Game.user2)
+    ranked_games = (
+        sa.select(
+            low.label("low"),
+            high.label("high"),
+            Game.game_id,
+            sa.func.row_number()
+            .over(partition_by=(low, high), order_by=sa.func.random())
+            .label("rn"),
+        )
         .where(
-            sa.or_(
-                sa.and_(Game.user1 == user1.user_id, Game.user2 == user2.user_id),
-                sa.and_(Game.user1 == user2.user_id, Game.user2 == user1.user_id),
-            ),
+            Game.user1.in_(user_ids),
+            Game.user2.in_(user_ids),
             Game.end_state != GameEndState.DISCONNECTED,
         )
-        .order_by(sa.func.random())
-        .limit(1)
+        .subquery()
     )
-    return session.scalar(stmt)
+    stmt = sa.select(
+        ranked_games.c.low, ranked_games.c.high, ranked_games.c.game_id
+    ).where(ranked_games.c.rn == 1)
+
+    return {(low, high): game_id for low, high, game_id in session.execute(stmt)}
 
 
 def main() -> int:
@@ -54,8 +78,9 @@ def main() -> int:
 
     engine = sa.create_engine(f"sqlite:///{args.database}")
 
-    # get ranked users
+    # use one session (and thus one connection) for all queries
     with sa.orm.Session(engine) as session:
+        # get ranked users
         stmt = (
             sa.select(User)
             .order_by(User.ranking_order_expression().desc())
@@ -63,19 +88,21 @@ def main() -> int:
         )
         ranking = session.scalars(stmt).all()
 
+        games = pick_games(session, ranking)
+
     for user1, user2 in itertools.combinations(ranking, 2):
-        with sa.orm.Session(engine) as session:
-            game = pick_game(session, user1, user2)
-            if game:
-                print(
-                    ",".join(  # noqa: FLY002
-                        [
-                            user1.username,
-                            user2.username,
-                            game.game_id,
-                        ]
-                    )
+        ids = (user1.user_id, user2.user_id)
+        game_id = games.get((min(ids), max(ids)))
+        if game_id:
+            print(
+                ",".join(  # noqa: FLY002
+                    [
+                        user1.username,
+                        user2.username,
+                        game_id,
+                    ]
                 )
+            )
 
     return 0
 
@@ -3,10 +3,10 @@
 import reflex as rx
 
 from .components import standard_layout
-from . import config, reflex_local_auth
+from . import config, game_files, leaderboard_snapshot, reflex_local_auth
 from .pages import user_dashboard, leaderboard, games, settings
 from .reflex_local_auth.local_auth import LocalAuthState
-from .protected_state import UserDashboardState
+from .protected_state import LeaderboardState, UserDashboardState
 
 
 def _load_comprl_configuration() -> None:
@@ -62,7 +62,10 @@ def registration() -> rx.Component:
     return standard_layout(reflex_local_auth.pages.register_page())
 
 
-app = rx.App(theme=rx.theme(has_background=True, accent_color="teal"))
+app = rx.App(
+    theme=rx.theme(has_background=True, accent_color="teal"),
+    api_transformer=game_files.api,
+)
 app.add_page(
     user_dashboard.dashboard,
     route="/dashboard",
@@ -73,7 +76,7 @@ app.add_page(
     leaderboard.leaderboard,
     route="/leaderboard",
     title="Leaderboard",
-    on_load=UserDashboardState.on_load,
+    on_load=LeaderboardState.on_load,
 )
 app.add_page(
     games.game_overview,
@@ -87,3 +90,5 @@ app.add_page(
 )
 
 app.register_lifespan_task(_load_comprl_configuration)
+# needs the configuration, so has to be registered after _load_comprl_configuration
+app.register_lifespan_task(leaderboard_snapshot.refresh_periodically)
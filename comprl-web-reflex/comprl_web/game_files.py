@@ -0,0 +1,118 @@
+"""Download of game files via a plain HTTP route.
+
+Game files are served directly from disk by the backend, instead of reading them into
+memory and sending them through the websocket.
+
+As the download is a plain HTTP request, the route cannot access the login state of the
+user.  Instead, download links are created by an (authenticated) event handler and are
+signed with the secret token of the user's login session.  They are only valid for a
+short time and as long as the login session exists.
+"""
+
+import datetime
+import hashlib
+import hmac
+import pathlib
+import time
+
+import sqlalchemy as sa
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import FileResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+from . import config
+from .reflex_local_auth.auth_session import LocalAuthSession
+from .reflex_local_auth.local_auth import get_session
+
+ROUTE = "/_game_file"
+# time (in seconds) for which a download link is valid
+LINK_VALIDITY_S = 60
+
+
+def get_game_actions_dir() -> pathlib.Path:
+    return config.get_config().data_dir / "game_actions"
+
+
+def get_game_file_path(game_id: str) -> pathlib.Path:
+    return get_game_actions_dir() / f"{game_id}.pkl"
+
+
+def _sign(auth_token: str, game_id: str, expires: int) -> str:
+    message = f"{game_id}:{expires}".encode()
+    return hmac.new(auth_token.encode(), message, hashlib.sha256).hexdigest()
+
+
+def _get_auth_session(auth_session_id: int) -> LocalAuthSession | None:
+    with get_session() as session:
+        return session.scalars(
+            sa.select(LocalAuthSession).where(
+                LocalAuthSession.id == auth_session_id,
+                LocalAuthSession.expiration
+                >= datetime.datetime.now(datetime.timezone.utc),
+            )
+        ).first()
+
+
+def get_download_url(auth_token: str, game_id: str) -> str | None:
+    """Create a download link for the given game.
+
+    Args:
+        auth_token: Token of the login session of the user.
+        game_id: ID of the game.
+
+    Returns:
+        Relative URL of the download link or None if there is no login session with the
+        given token.
+    """
+    with get_session() as session:
+        auth_session_id = session.scalar(
+            sa.select(LocalAuthSession.id).where(
+                LocalAuthSession.session_id == auth_token
+            )
+        )
+    if auth_session_id is None:
+        return None
+
+    expires = int(time.time()) + LINK_VALIDITY_S
+    signature = _sign(auth_token, game_id, expires)
+    return (
+        f"{ROUTE}/{game_id}"
+        f"?session={auth_session_id}&expires={expires}&signature={signature}"
+    )
+
+
+def _download_game_file(request: Request) -> Response:
+    # This is a sync function, so Starlette runs it in a thread pool and the database
+    # access does not block the event loop.
+    game_id = request.path_params["game_id"]
+    try:
+        auth_session_id = int(request.query_params["session"])
+        expires = int(request.query_params["expires"])
+        signature = request.query_params["signature"]
+    except (KeyError, ValueError):
+        return PlainTextResponse("Invalid download link.", status_code=400)
+
+    if expires < time.time():
+        return PlainTextResponse("Download link has expired.", status_code=403)
+
+    auth_session = _get_auth_session(auth_session_id)
+    if auth_session is None or not hmac.compare_digest(
+        signature, _sign(auth_session.session_id, game_id, expires)
+    ):
+        return PlainTextResponse("Invalid download link.", status_code=403)
+
+    game_file_path = get_game_file_path(game_id)
+    if not game_file_path.is_file():
+        return PlainTextResponse("Game file not found.", status_code=404)
+
+    # FileResponse streams the file from disk
+    return FileResponse(
+        game_file_path,
+        media_type="application/octet-stream",
+        filename=game_file_path.name,
+    )
+
+
+# app providing the download route (to be used as api_transformer of the Reflex app)
+api = Starlette(routes=[Route(ROUTE + "/{game_id}", _download_game_file)])
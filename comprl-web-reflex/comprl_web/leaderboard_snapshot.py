@@ -0,0 +1,121 @@
+"""In-memory snapshot of the leaderboard, shared by all sessions.
+
+The snapshot is created at startup and then refreshed periodically in the background, so
+loading the leaderboard page never has to wait for the database.
+"""
+
+import asyncio
+import dataclasses
+import random
+import time
+from typing import NamedTuple
+
+import sqlalchemy as sa
+
+from comprl.server.data.sql_backend import User
+
+from .reflex_local_auth.local_auth import get_session
+
+# interval (in seconds) in which the snapshot is refreshed
+REFRESH_INTERVAL_S = 30
+# maximum random delay (in seconds) added to the refresh interval, so that multiple
+# workers don't all query the database at the same time
+REFRESH_JITTER_S = 5
+# snapshots older than this (in seconds) are refreshed on access (should only happen if
+# the background refresh is not running)
+MAX_AGE_S = 5 * REFRESH_INTERVAL_S
+
+
+class RankedUser(NamedTuple):
+    ranking: int
+    username: str
+    score: float
+    mu: float
+    sigma: float
+
+
+@dataclasses.dataclass
+class LeaderboardEntry:
+    """Row of the leaderboard page, formatted for display."""
+
+    ranking: int
+    username: str
+    score: float
+    mu_sigma: str
+
+
+class LeaderboardSnapshot(NamedTuple):
+    users: tuple[RankedUser, ...]
+    # the users formatted for the leaderboard page (formatted once per refresh instead
+    # of every time a page is loaded)
+    entries: tuple[LeaderboardEntry, ...]
+    # rank of each user by user ID (users with equal score share the same rank)
+    rank_by_user_id: dict[int, int]
+    # time of the refresh (from time.monotonic())
+    timestamp: float
+
+
+_snapshot: LeaderboardSnapshot | None = None
+
+
+def _load_ranked_users() -> tuple[tuple[RankedUser, ...], dict[int, int]]:
+    score = User.ranking_order_expression()
+    stmt = sa.select(
+        User.user_id,
+        sa.func.row_number().over(order_by=score.desc()).label("ranking"),
+        sa.func.rank().over(order_by=score.desc()).label("rank"),
+        User.username,
+        score.label("score"),
+        User.mu,
+        User.sigma,
+    ).order_by(score.desc())
+
+    # Fetch in chunks (with a server-side cursor on databases that support it), so the
+    # rows are converted while they arrive instead of buffering the whole result first.
+    stmt = stmt.execution_options(yield_per=1000)
+    users = []
+    rank_by_user_id = {}
+    with get_session() as session:
+        for user_id, ranking, rank, *entry in session.execute(stmt):
+            users.append(RankedUser(ranking, *entry))
+            rank_by_user_id[user_id] = rank
+
+    return tuple(users), rank_by_user_id
+
+
+def _to_entry(user: RankedUser) -> LeaderboardEntry:
+    return LeaderboardEntry(
+        user.ranking,
+        user.username,
+        round(user.score, 2),
+        f"{user.mu:.2f} / {user.sigma:.2f}",
+    )
+
+
+def refresh_snapshot() -> LeaderboardSnapshot:
+    """Load the leaderboard from the database and replace the snapshot."""
+    global _snapshot
+    users, rank_by_user_id = _load_ranked_users()
+    entries = tuple(map(_to_entry, users))
+    _snapshot = LeaderboardSnapshot(users, entries, rank_by_user_id, time.monotonic())
+    return _snapshot
+
+
+def get_snapshot() -> LeaderboardSnapshot:
+    """Get the current snapshot.
+
+    Only loads from the database if there is no snapshot yet or it is outdated.
+    """
+    if _snapshot is None or time.monotonic() - _snapshot.timestamp > MAX_AGE_S:
+        return refresh_snapshot()
+    return _snapshot
+
+
+async def refresh_periodically() -> None:
+    """Keep the snapshot up to date.  Meant to be registered as lifespan task."""
+    while True:
+        try:
+            await asyncio.to_thread(refresh_snapshot)
+        except Exception as e:
+            print(f"Failed to refresh leaderboard snapshot: {e}")
+        await asyncio.sleep(REFRESH_INTERVAL_S + random.random() * REFRESH_JITTER_S)
@@ -3,20 +3,65 @@
 import reflex as rx
 
 from ..components import standard_layout
-from ..protected_state import UserDashboardState
+from ..protected_state import LeaderboardEntry, LeaderboardState
 from .. import reflex_local_auth
 
 
+def show_entry(entry: LeaderboardEntry) -> rx.Component:
+    """Show a leaderboard entry in a table row."""
+    return rx.table.row(
+        rx.table.cell(entry.ranking),
+        rx.table.cell(entry.username),
+        rx.table.cell(entry.score),
+        rx.table.cell(entry.mu_sigma),
+    )
+
+
+def leaderboard_table() -> rx.Component:
+    """Render the leaderboard table."""
+    return rx.vstack(
+        rx.form(
+            rx.hstack(
+                rx.text("Search for user:"),
+                rx.input(name="search_username", placeholder="Username"),
+                rx.button("Search"),
+            ),
+            on_submit=LeaderboardState.search_user,
+        ),
+        rx.cond(
+            LeaderboardState.search_username,
+            rx.hstack(
+                rx.text(f"Search results for user: {LeaderboardState.search_username}"),
+                rx.button("Clear search", on_click=LeaderboardState.clear_search),
+            ),
+        ),
+        rx.table.root(
+            rx.table.header(
+                rx.table.row(
+                    rx.foreach(
+                        LeaderboardState.leaderboard_header,
+                        rx.table.column_header_cell,
+                    )
+                ),
+            ),
+            rx.table.body(rx.foreach(LeaderboardState.leaderboard_entries, show_entry)),
+            on_mount=LeaderboardState.load_leaderboard,
+            width="100%",
+        ),
+        rx.hstack(
+            rx.button("First", on_click=LeaderboardState.first_page),
+            rx.button("Prev", on_click=LeaderboardState.prev_page),
+            rx.text(
+                f"Page {LeaderboardState.page_number} / {LeaderboardState.total_pages}"
+            ),
+            rx.button("Next", on_click=LeaderboardState.next_page),
+        ),
+    )
+
+
 @reflex_local_auth.require_login
 def leaderboard() -> rx.Component:
     return standard_layout(
-        rx.data_table(
-            data=UserDashboardState.leaderboard_entries,
-            columns=["Ranking", "Username", "Score (µ - 3σ)", "µ / σ"],
-            search=True,
-            sort=False,
-            pagination={"limit": 100},
-            on_mount=UserDashboardState.update_ranked_users,
-        ),
+        leaderboard_table(),
         heading="Leaderboard",
     )
@@ -3,39 +3,44 @@
 import reflex as rx
 
 from ..components import standard_layout
-from ..protected_state import SettingsState
+from ..protected_state import Banner, SettingsState
 from .. import reflex_local_auth
 
 
+def show_banner(banner: Banner) -> rx.Component:
+    """Show a status or error message."""
+    return rx.cond(
+        banner.is_error,
+        rx.callout(
+            banner.text,
+            icon="triangle_alert",
+            color_scheme="red",
+            role="alert",
+            width="100%",
+        ),
+        rx.callout(
+            banner.text,
+            icon="check",
+            color_scheme="green",
+            role="status",
+            width="100%",
+        ),
+    )
+
+
 def change_username_card() -> rx.Component:
     return rx.card(
         rx.heading("Change Login Name", as_="h2", size="4"),
-        rx.cond(
-            SettingsState.username_error_message != "",
-            rx.callout(
-                SettingsState.username_error_message,
-                icon="triangle_alert",
-                color_scheme="red",
-                role="alert",
-                width="100%",
-            ),
-        ),
-        rx.cond(
-            SettingsState.username_status_message != "",
-            rx.callout(
-                SettingsState.username_status_message,
-                icon="check",
-                color_scheme="green",
-                role="status",
-                width="100%",
-            ),
-        ),
+        rx.foreach(SettingsState.username_banners, show_banner),
         rx.form(
             rx.hstack(
+                # Inputs are uncontrolled (the values are only needed on submit), so
+                # typing does not cause any events.  The key makes sure the input is
+                # recreated with the new default value when the username changes.
                 rx.input(
                     name="username",
-                    value=SettingsState.username,
-                    on_change=SettingsState.set_username,
+                    default_value=SettingsState.username,
+                    key=SettingsState.username,
                     width="100%",
                 ),
                 rx.hstack(
@@ -58,41 +63,20 @@ def change_password_card() -> rx.Component:
     return rx.card(
         rx.heading("Change Password", as_="h2", size="4"),
         rx.spacer(height="0.5rem"),
-        rx.cond(
-            SettingsState.password_error_message != "",
-            rx.callout(
-                SettingsState.password_error_message,
-                icon="triangle_alert",
-                color_scheme="red",
-                role="alert",
-                width="100%",
-            ),
-        ),
-        rx.cond(
-            SettingsState.password_status_message != "",
-            rx.callout(
-                SettingsState.password_status_message,
-                icon="check",
-                color_scheme="green",
-                role="status",
-                width="100%",
-            ),
-        ),
+        rx.foreach(SettingsState.password_banners, show_banner),
         rx.form(
             rx.vstack(
                 rx.text("Current Password:"),
                 rx.input(
                     name="current_password",
-                    value=SettingsState.current_password,
-                    on_change=SettingsState.set_current_password,
+                    id="current_password",
                     type="password",
                     width="100%",
                 ),
                 rx.text("New Password:"),
                 rx.input(
                     name="new_password",
-                    value=SettingsState.new_password,
-                    on_change=SettingsState.set_new_password,
+                    id="new_password",
                     type="password",
                     placeholder="min. 8 characters",
                     width="100%",
@@ -100,8 +84,7 @@ def change_password_card() -> rx.Component:
                 rx.text("Confirm New Password:"),
                 rx.input(
                     name="confirm_password",
-                    value=SettingsState.confirm_password,
-                    on_change=SettingsState.set_confirm_password,
+                    id="confirm_password",
                     type="password",
                     width="100%",
                 ),
@@ -1,17 +1,22 @@
 """State for the protected pages."""
 
+import asyncio
 import dataclasses
+import datetime
+import functools
+import os
 import textwrap
-import pathlib
 from typing import Sequence
 
 import reflex as rx
 import sqlalchemy as sa
+from reflex.utils.exec import is_prod_mode
 
-from comprl.server.data.sql_backend import Game, User, get_ranked_users, hash_password
+from comprl.server.data.sql_backend import Game, User, hash_password
 from comprl.server.data.interfaces import GameEndState
 
-from . import config, reflex_local_auth
+from . import config, game_files, leaderboard_snapshot, reflex_local_auth
+from .leaderboard_snapshot import LeaderboardEntry
 from .reflex_local_auth.local_auth import get_session
 from .reflex_local_auth.registration import PASSWORD_MIN_LENGTH, validate_username
 from .reflex_local_auth.login import verify_password
@@ -24,6 +29,14 @@ class GameStatistics:
     num_disconnects: int = 0
 
 
+@dataclasses.dataclass
+class Banner:
+    """Status or error message shown on a settings card."""
+
+    is_error: bool
+    text: str
+
+
 @dataclasses.dataclass
 class GameInfo:
     player1: str
@@ -34,6 +47,22 @@ class GameInfo:
     has_game_file: bool
 
 
+@functools.lru_cache(maxsize=4096)
+def _build_client_config(server_url: str, port: int, token: str) -> str:
+    """Build the client configuration shown on the dashboard.
+
+    Cached across sessions, so opening the dashboard in a new tab does not format it
+    again.
+    """
+    return textwrap.dedent(
+        f"""
+        export COMPRL_SERVER_URL={server_url}
+        export COMPRL_SERVER_PORT={port}
+        export COMPRL_ACCESS_TOKEN={token}
+        """
+    ).strip()
+
+
 class ProtectedState(reflex_local_auth.LocalAuthState):
     """Base for protected states."""
 
@@ -44,98 +73,151 @@ class ProtectedState(reflex_local_auth.LocalAuthState):
 
 class UserDashboardState(ProtectedState):
     game_statistics: GameStatistics = GameStatistics()
-    ranked_users: list[User] = []
 
-    def on_load(self):
+    async def on_load(self):
         super().on_load()
-        self.game_statistics = self._load_game_statistics()
+        # The dashboard needs only this one query (the ranking comes from the shared
+        # leaderboard snapshot).  Run it in a thread, so it does not block the event
+        # loop for the other sessions.
+        user_id = self.authenticated_user.user_id
+        self.game_statistics = await asyncio.to_thread(
+            self._load_game_statistics, user_id
+        )
 
     def do_logout(self):
         self.game_statistics = GameStatistics()
         return reflex_local_auth.LocalAuthState.do_logout
 
-    def _load_game_statistics(self):
-        stats = GameStatistics()
+    @staticmethod
+    def _load_game_statistics(user_id: int) -> GameStatistics:
+        # Winner and disconnected player are always one of the two players, so all
+        # counts can be computed in one pass over the games of the user.
+        stmt = sa.select(
+            sa.func.count(),
+            sa.func.count().filter(Game.winner == user_id),
+            sa.func.count().filter(Game.disconnected == user_id),
+        ).where(sa.or_(Game.user1 == user_id, Game.user2 == user_id))
 
         with get_session() as session:
-            stats.num_games_played = (
-                session.query(Game)
-                .filter(
-                    sa.or_(
-                        Game.user1 == self.authenticated_user.user_id,
-                        Game.user2 == self.authenticated_user.user_id,
-                    )
-                )
-                .with_entities(sa.func.count())
-                .scalar()
-            )
-
-            stats.num_games_won = (
-                session.query(Game)
-                .filter(Game.winner == self.authenticated_user.user_id)
-                .with_entities(sa.func.count())
-                .scalar()
-            )
+            played, won, disconnects = session.execute(stmt).one()
 
-            stats.num_disconnects = (
-                session.query(Game)
-                .filter(Game.disconnected == self.authenticated_user.user_id)
-                .with_entities(sa.func.count())
-                .scalar()
-            )
-        return stats
+        return GameStatistics(
+            num_games_played=played, num_games_won=won, num_disconnects=disconnects
+        )
 
     @rx.var(cache=False, initial_value=0)
     def ranking_position(self) -> int:
         if not self.is_authenticated:
             return -1
 
+        # This var is recomputed on every state update, so look the rank up in the
+        # shared leaderboard snapshot instead of querying the database.
+        user_id = self.authenticated_user.user_id
+        rank = leaderboard_snapshot.get_snapshot().rank_by_user_id.get(user_id)
+        if rank is not None:
+            return rank
+
+        # Not in the snapshot (yet), e.g. for a newly registered user.  The rank is one
+        # more than the number of users with a higher score (users with equal score
+        # share the same rank).
+        score = User.ranking_order_expression()
         with get_session() as session:
-            ranked_users_query = session.query(
-                User,
-                sa.func.rank()
-                .over(order_by=User.ranking_order_expression().desc())
-                .label("rank"),
-            ).subquery()
-
-            query = (
-                session.query(ranked_users_query)
-                .filter(ranked_users_query.c.user_id == self.authenticated_user.user_id)
-                .with_entities(ranked_users_query.c.rank)
+            user_score = session.scalar(sa.select(score).where(User.user_id == user_id))
+            if user_score is None:
+                return -1
+
+            num_better_users = session.scalar(
+                sa.select(sa.func.count()).where(score > user_score)
             )
-            rank = query.first()
 
-        if rank is None:
-            return -1
-        return rank[0]
+        return (num_better_users or 0) + 1
 
     @rx.var(cache=True, initial_value="")
     def client_config(self) -> str:
         cfg = config.get_config()
-        return textwrap.dedent(
-            f"""
-            export COMPRL_SERVER_URL={cfg.server_url}
-            export COMPRL_SERVER_PORT={cfg.port}
-            export COMPRL_ACCESS_TOKEN={self.authenticated_user.token}
-            """
-        ).strip()
+        return _build_client_config(
+            cfg.server_url, cfg.port, self.authenticated_user.token
+        )
+
+
+class LeaderboardState(ProtectedState):
+    """State for the leaderboard page.
+
+    Only the currently shown page of the leaderboard is loaded from the database.
+    """
+
+    leaderboard_header: list[str] = ["Ranking", "Username", "Score (µ - 3σ)", "µ / σ"]
+    leaderboard_entries: list[LeaderboardEntry] = []
+    search_username: str = ""
+
+    total_users: int = 0
+    offset: int = 0
+    limit: int = 100
+
+    def do_logout(self):
+        self.leaderboard_entries = []
+        self.search_username = ""
+        return reflex_local_auth.LocalAuthState.do_logout
+
+    def _get_leaderboard_page(self) -> tuple[Sequence[LeaderboardEntry], int]:
+        """Get the entries of the current page and the total number of matching users.
+
+        The page is taken from the shared leaderboard snapshot, so this does not access
+        the database.  The ranking is computed over all users, so it is still correct
+        when searching for a username.
+        """
+        entries: Sequence[LeaderboardEntry] = (
+            leaderboard_snapshot.get_snapshot().entries
+        )
+        if self.search_username:
+            search = self.search_username.casefold()
+            entries = [e for e in entries if search in e.username.casefold()]
+
+        return entries[self.offset : self.offset + self.limit], len(entries)
+
+    @rx.var(cache=True, initial_value=1)
+    def page_number(self) -> int:
+        return (self.offset // self.limit) + 1 + (1 if self.offset % self.limit else 0)
+
+    @rx.var(cache=True, initial_value=1)
+    def total_pages(self) -> int:
+        return self.total_users // self.limit + (
+            1 if self.total_users % self.limit else 0
+        )
 
     @rx.event
-    def update_ranked_users(self) -> None:
-        with get_session() as session:
-            self.ranked_users = get_ranked_users(session)  # type: ignore
+    def first_page(self):
+        self.offset = 0
+        self.load_leaderboard()
 
-    @rx.var(cache=True, initial_value=())
-    def leaderboard_entries(self) -> Sequence[tuple[int, str, float, str]]:
-        return [
-            (
-                i + 1,
-                user.username,
-                round(user.score(), 2),
-                f"{user.mu:.2f} / {user.sigma:.2f}",
-            )
-            for i, user in enumerate(self.ranked_users)
-        ]
+    @rx.event
+    def prev_page(self):
+        self.offset = max(self.offset - self.limit, 0)
+        self.load_leaderboard()
+
+    @rx.event
+    def next_page(self):
+        if self.offset + self.limit < self.total_users:
+            self.offset += self.limit
+        self.load_leaderboard()
+
+    @rx.event
+    def search_user(self, form_data):
+        self.offset = 0
+        self.search_username = form_data["search_username"].strip()
+        self.load_leaderboard()
+
+    @rx.event
+    def clear_search(self):
+        self.offset = 0
+        self.search_username = ""
+        self.load_leaderboard()
+
+    @rx.event
+    def load_leaderboard(self) -> None:
+        # the entries are already formatted when the snapshot is created
+        entries, self.total_users = self._get_leaderboard_page()
+        self.leaderboard_entries = list(entries)
 
 
 class UserGamesState(ProtectedState):
@@ -149,37 +231,56 @@ class UserGamesState(ProtectedState):
     offset: int = 0
     limit: int = 10
 
+    # Keys (start_time, id) of the first and last game of the current page.  Pages are
+    # selected relative to these keys (keyset pagination) instead of using an SQL
+    # OFFSET, so the database does not have to skip over all games of the previous
+    # pages.  `offset` is only kept for showing the page number.
+    _first_key: tuple[datetime.datetime, int] | None = None
+    _last_key: tuple[datetime.datetime, int] | None = None
+
     def do_logout(self):
         self.user_games = []
         self.search_id = ""
+        self._first_key = None
+        self._last_key = None
         return reflex_local_auth.LocalAuthState.do_logout
 
-    def _get_num_user_games(self) -> int:
-        with get_session() as session:
-            return (
-                session.query(Game)
-                .filter(
-                    sa.or_(
-                        Game.user1 == self.authenticated_user.user_id,
-                        Game.user2 == self.authenticated_user.user_id,
-                    )
-                )
-                .with_entities(sa.func.count())
-                .scalar()
-            )
-
-    def _get_user_games(self) -> Sequence[Game]:
+    def _get_user_games(
+        self,
+        key_filter: sa.ColumnElement[bool] | None = None,
+        ascending: bool = False,
+    ) -> Sequence[sa.Row[tuple[Game, int]]]:
+        """Get the games of a page.
+
+        Each row also contains the number of matching games from the start of the page
+        on (computed with a window function, so no separate count query is needed).
+
+        Args:
+            key_filter: Condition on the key (see :meth:`_game_key`) selecting where
+                the page starts.
+            ascending: Go from old to new games, starting at ``key_filter`` (used for
+                the previous page).  The returned games are always sorted from new to
+                old.
+        """
         if not self.is_authenticated:
             return []
 
+        if ascending:
+            order = (Game.start_time.asc(), Game.id.asc())
+        else:
+            order = (Game.start_time.desc(), Game.id.desc())
+
         with get_session() as session:
             stmt = (
-                sa.select(Game)
+                sa.select(Game, sa.func.count().over().label("total"))
                 .options(
-                    sa.orm.joinedload(Game.user1_),
-                    sa.orm.joinedload(Game.user2_),
-                    sa.orm.joinedload(Game.winner_),
-                    sa.orm.joinedload(Game.disconnected_),
+                    sa.orm.selectinload(Game.user1_),
+                    sa.orm.selectinload(Game.user2_),
+                    sa.orm.selectinload(Game.winner_),
+                    sa.orm.selectinload(Game.disconnected_),
+                    # fail loudly instead of silently running one query per game if
+                    # a relationship that is not loaded above is accessed
+                    sa.orm.raiseload("*"),
                 )
                 .filter(
                     sa.or_(
@@ -187,14 +288,23 @@ class UserGamesState(ProtectedState):
                         Game.user2 == self.authenticated_user.user_id,
                     )
                 )
-                .order_by(Game.start_time.desc())
-                .offset(self.offset)
+                .order_by(*order)
                 .limit(self.limit)
             )
+            if key_filter is not None:
+                stmt = stmt.filter(key_filter)
             if self.search_id:
                 stmt = stmt.filter(Game.game_id == self.search_id)
 
-            return session.scalars(stmt).all()
+            rows = session.execute(stmt).all()
+
+        return rows[::-1] if ascending else rows
+
+    @staticmethod
+    def _game_key() -> sa.Tuple:
+        # the id breaks ties between games with the same start time (the indexes on
+        # (user, start_time) implicitly include it as rowid)
+        return sa.tuple_(Game.start_time, Game.id)
 
     @rx.var(cache=True, initial_value=1)
     def page_number(self) -> int:
@@ -208,73 +318,130 @@ class UserGamesState(ProtectedState):
 
     @rx.event
     def first_page(self):
-        self.offset = 0
-        self.load_user_games()
+        self._load_first_page()
 
     @rx.event
     def prev_page(self):
-        self.offset = max(self.offset - self.limit, 0)
-        self.load_user_games()
+        if self._first_key is None or self.offset == 0:
+            return self._load_first_page()
+
+        rows = self._get_user_games(
+            self._game_key() > sa.tuple_(*self._first_key), ascending=True
+        )
+        if not rows:
+            return self._load_first_page()
+
+        # the total of the ascending query is the number of newer games
+        self.offset = max(rows[0].total - len(rows), 0)
+        self._show_games(rows)
 
     @rx.event
     def next_page(self):
-        if self.offset + self.limit < self.total_items:
-            self.offset += self.limit
-        self.load_user_games()
+        if self._last_key is None or self.offset + self.limit >= self.total_items:
+            return self.load_user_games()
+
+        rows = self._get_user_games(self._game_key() < sa.tuple_(*self._last_key))
+        if not rows:
+            # there are no games anymore after the current page
+            self.total_items = self.offset + len(self.user_games)
+            return
+
+        self.offset += self.limit
+        self.total_items = self.offset + rows[0].total
+        self._show_games(rows)
 
     @rx.event
     def search_game(self, form_data):
-        self.offset = 0
         self.search_id = form_data["search_id"]
-        self.load_user_games()
+        self._load_first_page()
 
     @rx.event
     def clear_search(self):
-        self.offset = 0
         self.search_id = ""
-        self.load_user_games()
+        self._load_first_page()
+
+    @staticmethod
+    def _to_game_info(game: Game, game_actions_dir: str) -> GameInfo:
+        if game.end_state == GameEndState.WIN:
+            result = f"{game.winner_.username} won ({game.score1} : {game.score2})"
+        elif game.end_state == GameEndState.DRAW:
+            result = f"Draw ({game.score1} : {game.score2})"
+        elif game.end_state == GameEndState.DISCONNECTED:
+            result = f"{game.disconnected_.username} disconnected"
+        else:
+            result = "Unknown"
+
+        # plain string operations, as this is done for every game on the page
+        game_file_exists = os.path.exists(
+            os.path.join(game_actions_dir, f"{game.game_id}.pkl")
+        )
+
+        return GameInfo(
+            game.user1_.username,
+            game.user2_.username,
+            result,
+            game.start_time.isoformat(sep=" ", timespec="seconds"),
+            game.game_id,
+            game_file_exists,
+        )
+
+    def _show_games(self, rows: Sequence[sa.Row[tuple[Game, int]]]) -> None:
+        game_actions_dir = str(game_files.get_game_actions_dir())
+        # Build the list first and assign it once: modifying the state var in place
+        # would go through Reflex' change tracking for every appended game.
+        self.user_games = [
+            self._to_game_info(game, game_actions_dir) for game, _ in rows
+        ]
+
+        if rows:
+            self._first_key = (rows[0].Game.start_time, rows[0].Game.id)
+            self._last_key = (rows[-1].Game.start_time, rows[-1].Game.id)
+        else:
+            self._first_key = None
+            self._last_key = None
 
-    def _get_game_file_path(self, game_id: str) -> pathlib.Path:
-        return config.get_config().data_dir / "game_actions" / f"{game_id}.pkl"
+    def _load_first_page(self) -> None:
+        rows = self._get_user_games()
+        self.offset = 0
+        self.total_items = rows[0].total if rows else 0
+        self._show_games(rows)
 
     @rx.event
     def load_user_games(self) -> None:
-        self.user_games = []
-        for game in self._get_user_games():
-            if game.end_state == GameEndState.WIN:
-                result = f"{game.winner_.username} won ({game.score1} : {game.score2})"
-            elif game.end_state == GameEndState.DRAW:
-                result = f"Draw ({game.score1} : {game.score2})"
-            elif game.end_state == GameEndState.DISCONNECTED:
-                result = f"{game.disconnected_.username} disconnected"
-            else:
-                result = "Unknown"
-
-            game_file_exists = self._get_game_file_path(game.game_id).exists()
-
-            self.user_games.append(
-                GameInfo(
-                    game.user1_.username,
-                    game.user2_.username,
-                    result,
-                    str(game.start_time.strftime("%Y-%m-%d %H:%M:%S")),
-                    str(game.game_id),
-                    game_file_exists,
-                )
-            )
+        """(Re)load the current page."""
+        if self._first_key is None:
+            return self._load_first_page()
 
-        self.total_items = self._get_num_user_games()
+        rows = self._get_user_games(self._game_key() <= sa.tuple_(*self._first_key))
+        if not rows:
+            return self._load_first_page()
+
+        self.total_items = self.offset + rows[0].total
+        self._show_games(rows)
 
     @rx.event
     def download_game(self, game_id: str):
-        game_file_path = self._get_game_file_path(game_id)
+        game_file_path = game_files.get_game_file_path(game_id)
+        if not game_file_path.is_file():
+            raise RuntimeError("Game file not found")
+
+        if not is_prod_mode():
+            # In dev mode, frontend and backend run on different ports, so the relative
+            # download link would not reach the backend.  Send the data directly.
+            return rx.download(
+                filename=game_file_path.name, data=game_file_path.read_bytes()
+            )
+
+        url = game_files.get_download_url(self.auth_token, game_id)
+        if url is None:
+            return reflex_local_auth.LoginState.redir
+
+        return rx.download(url=url, filename=game_file_path.name)
 
-        try:
-            data = game_file_path.read_bytes()
-        except Exception:
-            raise RuntimeError("Game file not found") from None
 
-        return rx.download(filename=game_file_path.name, data=data)
+def _get_banners(error_message: str, status_message: str) -> list[Banner]:
+    banners = [Banner(True, error_message), Banner(False, status_message)]
+    return [banner for banner in banners if banner.text]
 
 
 class SettingsState(ProtectedState):
@@ -284,12 +451,17 @@ class SettingsState(ProtectedState):
     username_status_message: str = ""
     username_error_message: str = ""
 
-    current_password: str = ""
-    new_password: str = ""
-    confirm_password: str = ""
     password_status_message: str = ""
     password_error_message: str = ""
 
+    @rx.var(cache=True)
+    def username_banners(self) -> list[Banner]:
+        return _get_banners(self.username_error_message, self.username_status_message)
+
+    @rx.var(cache=True)
+    def password_banners(self) -> list[Banner]:
+        return _get_banners(self.password_error_message, self.password_status_message)
+
     def on_load(self):
         super().on_load()
         self.username = self.authenticated_user.username
@@ -302,29 +474,10 @@ class SettingsState(ProtectedState):
         self.username = ""
         self.username_status_message = ""
         self.username_error_message = ""
-        self.current_password = ""
-        self.new_password = ""
-        self.confirm_password = ""
         self.password_status_message = ""
         self.password_error_message = ""
         return reflex_local_auth.LocalAuthState.do_logout
 
-    def set_username(self, username: str) -> None:
-        """Set the username in state."""
-        self.username = username
-
-    def set_current_password(self, current_password: str) -> None:
-        """Set the current password in state."""
-        self.current_password = current_password
-
-    def set_new_password(self, new_password: str) -> None:
-        """Set the new password in state."""
-        self.new_password = new_password
-
-    def set_confirm_password(self, confirm_password: str) -> None:
-        """Set the confirm password in state."""
-        self.confirm_password = confirm_password
-
     def save_username(self, form_data) -> None:
         """Validate and persist a new username."""
         desired_username = form_data["username"].strip()
@@ -347,27 +500,27 @@ class SettingsState(ProtectedState):
             self.username_status_message = "Username unchanged."
             return
 
+        # Rely on the unique constraint of the username instead of checking for an
+        # existing user first, so two users cannot take the same name concurrently.
         with get_session() as session:
-            existing_user = session.scalars(
-                sa.select(User).where(User.username == desired_username)
-            ).one_or_none()
-
-            if existing_user:
+            try:
+                result = session.execute(
+                    sa.update(User)
+                    .where(User.user_id == self.authenticated_user.user_id)
+                    .values(username=desired_username)
+                )
+                session.commit()
+            except sa.exc.IntegrityError:
                 self.username_error_message = "That username is already taken."
                 return
 
-            current_user = session.get(User, self.authenticated_user.user_id)
-            if current_user is None:
-                self.username_error_message = "Could not find current user."
-                return
-
-            current_user.username = desired_username
-            session.add(current_user)
-            session.commit()
+        if result.rowcount == 0:
+            self.username_error_message = "Could not find current user."
+            return
 
         self.username_status_message = "Username updated successfully."
 
-    def save_password(self, form_data):
+    async def save_password(self, form_data):
         """Validate and persist a new password for the current user."""
         current_password = form_data["current_password"]
         new_password = form_data["new_password"]
@@ -396,15 +549,20 @@ class SettingsState(ProtectedState):
                 self.password_error_message = "Could not find current user."
                 return
 
-            if not verify_password(user.password, current_password):
+            # Password hashing is deliberately slow, so run it in a thread to not block
+            # the event loop (and thus all other users) in the meantime.
+            if not await asyncio.to_thread(
+                verify_password, user.password, current_password
+            ):
                 self.password_error_message = "Current password is incorrect."
                 return
 
-            user.password = hash_password(new_password)
+            user.password = await asyncio.to_thread(hash_password, new_password)
             session.add(user)
             session.commit()
 
         self.password_status_message = "Password updated successfully."
-        self.current_password = ""
-        self.new_password = ""
-        self.confirm_password = ""
+        return [
+            rx.set_value(field, "")
+            for field in ("current_password", "new_password", "confirm_password")
+        ]
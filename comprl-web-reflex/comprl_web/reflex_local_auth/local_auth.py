@@ -8,11 +8,13 @@ Your app may inherit from LocalAuthState, or it may access it via the `get_state
 from __future__ import annotations
 
 import datetime
+import functools
+import pathlib
 
 import sqlalchemy as sa
 import reflex as rx
 
-from comprl.server.data.sql_backend import User
+from comprl.server.data.sql_backend import User, create_engine
 
 from .. import config
 from .auth_session import LocalAuthSession
@@ -22,11 +24,16 @@ DEFAULT_AUTH_SESSION_EXPIRATION_DELTA = datetime.timedelta(days=7)
 DEFAULT_AUTH_REFRESH_DELTA = datetime.timedelta(minutes=10)
 
 
+@functools.cache
+def _get_engine(database_path: pathlib.Path) -> sa.Engine:
+    # The engine (and thus its connection pool) is created only once per database, not
+    # for every session.
+    return create_engine(database_path)
+
+
 # TODO move to other module?
 def get_session() -> sa.orm.Session:
-    db_url = f"sqlite:///{config.get_config().database_path}"
-    engine = sa.create_engine(db_url)
-    return sa.orm.Session(engine)
+    return sa.orm.Session(_get_engine(config.get_config().database_path))
 
 
 NONE_USER = User(username="", password=b"", token="")
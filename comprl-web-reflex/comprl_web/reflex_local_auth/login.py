@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import asyncio
+
 import bcrypt
 import reflex as rx
 from sqlalchemy import select
@@ -35,7 +37,7 @@ class LoginState(LocalAuthState):
     error_message: str = ""
     redirect_to: str = ""
 
-    def on_submit(self, form_data) -> rx.event.EventSpec:
+    async def on_submit(self, form_data) -> rx.event.EventSpec:
         """Handle login form on_submit.
 
         Args:
@@ -60,7 +62,9 @@ class LoginState(LocalAuthState):
             and user.user_id is not None
             # and user.enabled  # FIXME
             and password
-            and verify_password(user.password, password)
+            # Password hashing is deliberately slow, so run it in a thread to not
+            # block the event loop (and thus all other users) in the meantime.
+            and await asyncio.to_thread(verify_password, user.password, password)
         ):
             # mark the user as logged in
             self._login(user.user_id)
@@ -82,13 +82,13 @@ class RegistrationState(LocalAuthState):
 
         return None
 
-    def _register_user(self, username: str, password: str) -> None:
+    def _register_user(self, username: str, password_hash: bytes) -> None:
         """Create the new user and add it to the database."""
         # TODO better use UserData.add_user() here, to avoid redundant code
         with get_session() as session:
             new_user = User(
                 username=username,
-                password=hash_password(password),
+                password=password_hash,
                 token=generate_access_token(),
                 # enabled=True,  # FIXME
             )
@@ -98,7 +98,7 @@ class RegistrationState(LocalAuthState):
             session.refresh(new_user)
             self.new_user_id = new_user.user_id
 
-    def handle_registration(
+    async def handle_registration(
         self, form_data
     ) -> rx.event.EventSpec | list[rx.event.EventSpec]:
         """Handle registration form on_submit.
@@ -117,7 +117,10 @@ class RegistrationState(LocalAuthState):
             self.new_user_id = -1
             return validation_errors
 
-        self._register_user(username, password)
+        # Password hashing is deliberately slow, so run it in a thread to not block the
+        # event loop (and thus all other users) in the meantime.
+        password_hash = await asyncio.to_thread(hash_password, password)
+        self._register_user(username, password_hash)
         return type(self).successful_registration
 
     async def successful_registration(self):
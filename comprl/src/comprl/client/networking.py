@@ -43,7 +43,7 @@ class ClientProtocol(amp.AMP):
         Args:
             reason (object): The reason for the lost connection.
         """
-        log.debug(f"Disconnected from the server. Reason: {reason}")
+        log.debug("Disconnected from the server. Reason: %s", reason)
         if reactor.running:
             reactor.stop()
         self.agent.on_disconnect()
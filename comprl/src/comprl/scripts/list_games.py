@@ -11,7 +11,7 @@ import sqlalchemy as sa
 import tabulate
 
 from comprl.server.config import load_config
-from comprl.server.data import Game
+from comprl.server.data import Game, User
 from comprl.server.data.interfaces import GameEndState
 
 
@@ -57,20 +57,35 @@ def main() -> int:
 
     table_data = []
     with sa.orm.Session(engine) as session:
-        for game in session.scalars(sa.select(Game)).all():
+        # Look up the usernames once instead of loading the related users of each game
+        # and stream the games in batches instead of loading all of them as ORM objects
+        # at once.
+        usernames = dict(session.execute(sa.select(User.user_id, User.username)).all())
+
+        games = session.execute(
+            sa.select(
+                Game.game_id,
+                Game.start_time,
+                Game.user1,
+                Game.user2,
+                Game.score1,
+                Game.score2,
+                Game.end_state,
+                Game.winner,
+                Game.disconnected,
+            ),
+            execution_options={"yield_per": 1000},
+        )
+        for game in games:
             game_data = {
                 "start_time": game.start_time,
-                "user1": game.user1_.username,
-                "user2": game.user2_.username,
+                "user1": usernames[game.user1],
+                "user2": usernames[game.user2],
                 "score1": game.score1,
                 "score2": game.score2,
                 "end_state": GameEndState(game.end_state).name,
-                "winner": game.winner_.username if game.winner_ is not None else None,
-                "disconnected": (
-                    game.disconnected_.username
-                    if game.disconnected_ is not None
-                    else None
-                ),
+                "winner": usernames.get(game.winner),
+                "disconnected": usernames.get(game.disconnected),
             }
 
             if args.id:
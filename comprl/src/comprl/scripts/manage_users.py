@@ -40,31 +40,15 @@ def list(
         users = session.scalars(stmt).all()
 
         for user in users:
-            num_games_played = (
-                session.query(Game)
-                .filter(
-                    sa.or_(
-                        Game.user1 == user.user_id,
-                        Game.user2 == user.user_id,
-                    )
-                )
-                .with_entities(sa.func.count())
-                .scalar()
-            )
-
-            num_games_won = (
-                session.query(Game)
-                .filter(Game.winner == user.user_id)
-                .with_entities(sa.func.count())
-                .scalar()
-            )
-
-            num_disconnects = (
-                session.query(Game)
-                .filter(Game.disconnected == user.user_id)
-                .with_entities(sa.func.count())
-                .scalar()
-            )
+            # winner and disconnected player are always one of the two players, so all
+            # counts can be computed in one query over the games of the user
+            num_games_played, num_games_won, num_disconnects = session.execute(
+                sa.select(
+                    sa.func.count(),
+                    sa.func.count().filter(Game.winner == user.user_id),
+                    sa.func.count().filter(Game.disconnected == user.user_id),
+                ).where(sa.or_(Game.user1 == user.user_id, Game.user2 == user.user_id))
+            ).one()
 
             data.append(
                 (
@@ -3,10 +3,11 @@
 from __future__ import annotations
 
 import datetime
+import os
 import re
 import sys
 from pprint import pprint
-from typing import Any, cast
+from typing import Any, Callable, cast
 
 from textual.app import App, ComposeResult
 from textual.widgets import Header, Footer, DataTable, Label
@@ -34,6 +35,30 @@ END
 """  # noqa: E501
 
 
+# Pattern matching all known line types of the monitor file.  Each line type is an
+# outer named group (used to dispatch the line, see Parser.parse) containing named
+# groups for the values.  Alternatives are tried in order, so the player in queue has
+# to come before the connected player (whose pattern is a prefix of it).
+_LINE_RE = re.compile(
+    "|".join(
+        [
+            r"(?P<timestamp>(?P<stamp>\d{4}-\d{2}-\d{2}[ T]\S+))$",
+            r"(?P<header_connected_players>Connected players \((?P<n_players>\d+)\):)",
+            r"(?P<header_games>Games \((?P<n_games>\d+)\):)",
+            r"(?P<header_players_in_queue>Players in queue \((?P<n_queue>\d+)\):)",
+            r"(?P<header_match_quality_scores>Match quality scores:)$",
+            r"(?P<end>END)$",
+            r"(?P<player_in_queue>\s+(?P<queue_player>\S+) \[(?P<queue_uuid>\S+)\]"
+            r" since (?P<since>.+))",
+            r"(?P<connected_player>\s+(?P<player>\S+) \[(?P<uuid>\S+)\])",
+            r"(?P<game>\s+(?P<game_id>\S+) \('(?P<player1>\S+)', '(?P<player2>\S+)'\))",
+            r"(?P<match_quality_score>\s+(?P<user1>\S+) vs (?P<user2>\S+):"
+            r" (?P<score>\S+))",
+        ]
+    )
+)
+
+
 # Note: this parser is pretty quick&dirty, so probably not super robust
 class Parser:
     """Parser for the CompRL monitor file format."""
@@ -49,126 +74,85 @@ class Parser:
             "players_in_queue": [],
             "match_quality_scores": [],
         }
-        # Define the structure of the monitor file as a list of line parser functions.
-        # Each function should return True if it parsed a matching line and False if the
-        # line did not match.
-        # In case a function returns False, the parse will move to the next function and
-        # run it on the same line.
-        # This is a pretty quick and dirty implementation.  It is not robust to failures
-        # somewhere in the middle.
-        self.document = [
-            self._timestamp,
-            self._newline,
-            self._header_connected_players,
-            self._connected_player,
-            self._newline,
-            self._header_games,
-            self._game,
-            self._newline,
-            self._header_players_in_queue,
-            self._player_in_queue,
-            self._newline,
-            self._header_match_quality_scores,
-            self._match_quality_score,
-            self._newline,
-            self._end,
-        ]
+        # Handlers for the line types of _LINE_RE (by name of the outer group)
+        self._handlers: dict[str, Callable[[re.Match], None]] = {
+            "timestamp": self._timestamp,
+            "header_connected_players": self._header_connected_players,
+            "connected_player": self._connected_player,
+            "header_games": self._header_games,
+            "game": self._game,
+            "header_players_in_queue": self._header_players_in_queue,
+            "player_in_queue": self._player_in_queue,
+            "header_match_quality_scores": self._header_match_quality_scores,
+            "match_quality_score": self._match_quality_score,
+            "end": self._end,
+        }
 
     def parse(self, lines: list[str]) -> None:
         """Parse the lines of the monitor file.
 
+        Each line is matched once against the pattern of all line types.  Empty and
+        unknown lines are skipped.
+
         Args:
             lines: Content of the monitor file split into lines.
         """
-        i = 0
-        for parser in self.document:
-            while i < len(lines):
-                if parser(lines[i].rstrip()):
-                    i += 1
-                else:
-                    break
-
-    def _newline(self, line: str) -> bool:
-        return line.strip() == ""
-
-    def _timestamp(self, line: str) -> bool:
+        match = _LINE_RE.match
+        handlers = self._handlers
+        for line in lines:
+            m = match(line.rstrip())
+            # the outer group of the line type is closed last, so it is the lastgroup
+            if m is not None and m.lastgroup is not None:
+                handlers[m.lastgroup](m)
+
+    def _timestamp(self, m: re.Match) -> None:
         try:
-            stamp = datetime.datetime.fromisoformat(line)
-            self.data["timestamp"] = stamp
+            self.data["timestamp"] = datetime.datetime.fromisoformat(m["stamp"])
         except ValueError:
-            return False
-
-        return True
-
-    def _header_connected_players(self, line: str) -> bool:
-        m = re.match(r"Connected players \((\d+)\):", line)
-        if m:
-            self.data["num_connected_players"] = int(m.group(1))
-            return True
-        return False
-
-    def _connected_player(self, line: str) -> bool:
-        m = re.match(r"\s+(\S+) \[(\S+)\]", line)
-        if m:
-            self.data["connected_players"].append(
-                {"player": m.group(1), "uuid": m.group(2)}
-            )
-            return True
-        return False
-
-    def _header_games(self, line: str) -> bool:
-        m = re.match(r"Games \((\d+)\):", line)
-        if m:
-            self.data["num_games"] = int(m.group(1))
-            return True
-        return False
-
-    def _game(self, line: str) -> bool:
-        m = re.match(r"\s+(\S+) \('(\S+)', '(\S+)'\)", line)
-        if m:
-            self.data["games"].append(
-                {"game": m.group(1), "player1": m.group(2), "player2": m.group(3)}
-            )
-            return True
-        return False
-
-    def _header_players_in_queue(self, line: str) -> bool:
-        m = re.match(r"Players in queue \((\d+)\):", line)
-        if m:
-            self.data["num_players_in_queue"] = int(m.group(1))
-            return True
-        return False
-
-    def _player_in_queue(self, line: str) -> bool:
-        m = re.match(r"\s+(\S+) \[(\S+)\] since (.+)", line)
-        if m:
-            self.data["players_in_queue"].append(
-                {"player": m.group(1), "uuid": m.group(2), "timestamp": m.group(3)}
-            )
-            return True
-        return False
-
-    def _header_match_quality_scores(self, line: str) -> bool:
-        return line == "Match quality scores:"
-
-    def _match_quality_score(self, line: str) -> bool:
-        m = re.match(r"\s+(\S+) vs (\S+): (\S+)", line)
-        if m:
-            self.data["match_quality_scores"].append(
-                {
-                    "user1": m.group(1),
-                    "user2": m.group(2),
-                    "score": float(m.group(3)),
-                }
-            )
-            return True
-        return False
-
-    def _end(self, line: str) -> bool:
-        if line == "END":
-            self.data["end"] = True
-            return True
-        return False
+            pass
+
+    def _header_connected_players(self, m: re.Match) -> None:
+        self.data["num_connected_players"] = int(m["n_players"])
+
+    def _connected_player(self, m: re.Match) -> None:
+        self.data["connected_players"].append(
+            {"player": m["player"], "uuid": m["uuid"]}
+        )
+
+    def _header_games(self, m: re.Match) -> None:
+        self.data["num_games"] = int(m["n_games"])
+
+    def _game(self, m: re.Match) -> None:
+        self.data["games"].append(
+            {"game": m["game_id"], "player1": m["player1"], "player2": m["player2"]}
+        )
+
+    def _header_players_in_queue(self, m: re.Match) -> None:
+        self.data["num_players_in_queue"] = int(m["n_queue"])
+
+    def _player_in_queue(self, m: re.Match) -> None:
+        self.data["players_in_queue"].append(
+            {
+                "player": m["queue_player"],
+                "uuid": m["queue_uuid"],
+                "timestamp": m["since"],
+            }
+        )
+
+    def _header_match_quality_scores(self, m: re.Match) -> None:
+        pass
+
+    def _match_quality_score(self, m: re.Match) -> None:
+        self.data["match_quality_scores"].append(
+            {
+                "user1": m["user1"],
+                "user2": m["user2"],
+                "score": float(m["score"]),
+            }
+        )
+
+    def _end(self, m: re.Match) -> None:
+        self.data["end"] = True
 
 
 def test() -> None:
@@ -213,6 +197,10 @@ class ComprlMonitorApp(App):
     def __init__(self, monitor_file_path: str) -> None:
         super().__init__()
         self.monitor_file_path = monitor_file_path
+        # modification time of the file when it was last loaded
+        self._last_mtime_ns: int | None = None
+        # rows currently shown in each table (by table ID)
+        self._table_rows: dict[str, list[tuple]] = {}
 
     def compose(self) -> ComposeResult:
         """Compose the TUI layout."""
@@ -237,8 +225,29 @@ class ComprlMonitorApp(App):
         self.reload_data()
         self.update_time = self.set_interval(10, self.reload_data)
 
+    def _update_table(
+        self, table_id: str, columns: tuple[str, ...], rows: list[tuple]
+    ) -> None:
+        """Replace the content of a table (does nothing if the rows didn't change)."""
+        if self._table_rows.get(table_id) == rows:
+            return
+        self._table_rows[table_id] = rows
+
+        table: DataTable = cast(DataTable, self.query_one(f"#{table_id}"))
+        table.clear(columns=True)
+        table.add_columns(*columns)
+        table.add_rows(rows)
+
     def reload_data(self) -> None:
-        """Reload the data from the monitor file and update the content in the TUI."""
+        """Reload the data from the monitor file and update the content in the TUI.
+
+        Does nothing if the file was not modified since the last reload.
+        """
+        mtime_ns = os.stat(self.monitor_file_path).st_mtime_ns
+        if mtime_ns == self._last_mtime_ns:
+            return
+        self._last_mtime_ns = mtime_ns
+
         with open(self.monitor_file_path, "r") as f:
             lines = f.readlines()
 
@@ -252,46 +261,40 @@ class ComprlMonitorApp(App):
         player_label.update(
             f"Connected Players ({parser.data['num_connected_players']}):"
         )
-        player_table: DataTable = cast(DataTable, self.query_one("#connected_players"))
-        player_table.clear(columns=True)
-        player_table.add_columns("User", "Player ID")
-        player_table.add_rows(
+        self._update_table(
+            "connected_players",
+            ("User", "Player ID"),
             [
                 (player["player"], player["uuid"])
                 for player in parser.data["connected_players"]
-            ]
+            ],
         )
 
         games_label: Label = cast(Label, self.query_one("#games_label"))
         games_label.update(f"Running Games ({parser.data['num_games']}):")
-        games_table: DataTable = cast(DataTable, self.query_one("#games"))
-        games_table.clear(columns=True)
-        games_table.add_columns("Game", "Player 1", "Player 2")
-        games_table.add_rows(
+        self._update_table(
+            "games",
+            ("Game", "Player 1", "Player 2"),
             [
                 (game["game"], game["player1"], game["player2"])
                 for game in parser.data["games"]
-            ]
+            ],
         )
 
         queue_label: Label = cast(Label, self.query_one("#queue_label"))
         queue_label.update(f"Players in Queue ({parser.data['num_players_in_queue']}):")
-        queue_table: DataTable = cast(DataTable, self.query_one("#queue"))
-        queue_table.clear(columns=True)
-        queue_table.add_columns("User", "Player ID", "Timestamp")
-        queue_table.add_rows(
+        self._update_table(
+            "queue",
+            ("User", "Player ID", "Timestamp"),
             [
                 (player["player"], player["uuid"], player["timestamp"])
                 for player in parser.data["players_in_queue"]
-            ]
+            ],
         )
 
-        match_quality_table: DataTable = cast(
-            DataTable, self.query_one("#match_quality_scores")
-        )
-        match_quality_table.clear(columns=True)
-        match_quality_table.add_columns("User 1", "User 2", "Score")
-        match_quality_table.add_rows(
+        self._update_table(
+            "match_quality_scores",
+            ("User 1", "User 2", "Score"),
             sorted(
                 [
                     (score["user1"], score["user2"], score["score"])
@@ -299,13 +302,14 @@ class ComprlMonitorApp(App):
                 ],
                 key=lambda x: x[2],  # type: ignore[index]
                 reverse=True,
-            )
+            ),
         )
 
-        lost_players_table: DataTable = cast(DataTable, self.query_one("#lost_players"))
-        lost_players_table.clear(columns=True)
-        lost_players_table.add_columns("User", "Player ID")
-        lost_players_table.add_rows(identify_lost_players(parser.data))
+        self._update_table(
+            "lost_players",
+            ("User", "Player ID"),
+            identify_lost_players(parser.data),
+        )
 
         self.refresh()
 
@@ -4,6 +4,8 @@ from __future__ import annotations
 
 import argparse
 import datetime
+import functools
+import heapq
 import importlib.abc
 import importlib.util
 import inspect
@@ -16,12 +18,21 @@ import time
 from typing import Type, TYPE_CHECKING
 
 import sqlalchemy as sa
+from twisted.internet.task import LoopingCall
 
 from comprl.server import config, networking
-from comprl.server.data import get_session, init_engine, User, Game, UserData
+from comprl.server.data import (
+    get_session,
+    init_engine,
+    User,
+    Game,
+    GameData,
+    UserData,
+)
 from comprl.server.data.models import DEFAULT_SIGMA
 from comprl.server.managers import GameManager, PlayerManager, MatchmakingManager
 from comprl.server.interfaces import IPlayer, IServer
+from comprl.server.util import BatchingStreamHandler
 
 if TYPE_CHECKING:
     from comprl.server.interfaces import IGame
@@ -40,7 +51,15 @@ class Server(IServer):
 
         self._monitor_log_path = config.get_config().monitor_log_path
         self._monitor_update_interval_s = 10
-        self._last_monitor_update = 0.0
+        # the file is rewritten at least this often, even if nothing changed, so that
+        # its timestamp shows that the server is still alive
+        self._monitor_heartbeat_interval_s = 60
+        self._monitor_loop: LoopingCall | None = None
+        # finished games are written to the database in batches
+        self._game_flush_interval_s = 1.0
+        self._game_flush_loop: LoopingCall | None = None
+        self._last_monitor_write = 0.0
+        self._last_monitor_state: tuple | None = None
         self._last_score_decay = 0.0
 
     def on_start(self):
@@ -49,9 +68,26 @@ class Server(IServer):
         # do not directly decay scores on start
         self._last_score_decay = time.time()
 
+        self._game_flush_loop = LoopingCall(self._flush_games)
+        self._game_flush_loop.start(self._game_flush_interval_s, now=False)
+
+        if self._monitor_log_path:
+            # scheduled separately, so on_update doesn't need to check if it is time
+            # to write the file
+            self._monitor_loop = LoopingCall(self._write_monitoring_data)
+            self._monitor_loop.start(self._monitor_update_interval_s, now=False)
+
     def on_stop(self):
         """gets called when the server stops"""
         log.info("Server stopped")
+        if self._monitor_loop is not None and self._monitor_loop.running:
+            self._monitor_loop.stop()
+        if self._game_flush_loop is not None and self._game_flush_loop.running:
+            self._game_flush_loop.stop()
+        self._flush_games()
+        num_lost_games = GameData.discard_pending()
+        if num_lost_games:
+            log.error("%d games could not be written to the database.", num_lost_games)
 
     def on_connect(self, player: IPlayer):
         """gets called when a player connects"""
@@ -106,48 +142,78 @@ class Server(IServer):
         """gets called every update cycle"""
         self.matchmaking.update()
         self._score_decay()
-        self._write_monitoring_data()
+
+    def _flush_games(self) -> None:
+        """Write pending games to the database."""
+        try:
+            GameData.flush()
+        except Exception:
+            # log instead of raising, as an exception would stop the LoopingCall
+            log.exception(
+                "Failed to write games to the database.  Retrying with next flush."
+            )
 
     def _write_monitoring_data(self):
+        """Write the monitor file (called every _monitor_update_interval_s)."""
         if not self._monitor_log_path:
             return
 
-        # only update every _monitor_update_interval_s
-        now = time.time()
-        if now - self._last_monitor_update < self._monitor_update_interval_s:
-            return
-
-        self._last_monitor_update = now
-        with open(self._monitor_log_path, "w") as f:
-
-            def plog(*args):
-                print(*args, file=f)
-
-            plog(datetime.datetime.now().isoformat(sep=" "))
+        now = time.monotonic()
 
-            n_connected = len(self.player_manager.connected_players)
-            plog(f"\nConnected players ({n_connected}):")
-            for player in self.player_manager.connected_players.values():
-                plog(f"\t{player.username} [{player.id}]")
-
-            n_games = len(self.game_manager.games)
-            plog(f"\nGames ({n_games}):")
-            for game in self.game_manager.games.values():
-                plog(f"\t{game.id} {tuple(str(pid) for pid in game.players)}")
+        # skip writing if nothing changed since the last write
+        state = (
+            self.player_manager.version,
+            self.game_manager.version,
+            self.matchmaking.version,
+            self.matchmaking._match_quality_scores,
+        )
+        if (
+            state == self._last_monitor_state
+            and now - self._last_monitor_write < self._monitor_heartbeat_interval_s
+        ):
+            return
+        self._last_monitor_state = state
+        self._last_monitor_write = now
+
+        # Build the whole content in memory, so it is written with a single write
+        # instead of one per line.
+        lines = [datetime.datetime.now().isoformat(sep=" ")]
+
+        # lines of players and games are formatted by the managers when they change
+        n_connected = len(self.player_manager.connected_players)
+        lines.append(f"\nConnected players ({n_connected}):")
+        lines.extend(self.player_manager.monitor_lines.values())
+
+        n_games = len(self.game_manager.games)
+        lines.append(f"\nGames ({n_games}):")
+        lines.extend(self.game_manager.monitor_lines.values())
+
+        n_queue = len(self.matchmaking._queue)
+        lines.append(f"\nPlayers in queue ({n_queue}):")
+        for entry in self.matchmaking._queue:
+            lines.append(
+                f"\t{entry.user.username} [{entry.player_id}]"
+                f" since {entry.in_queue_since}"
+            )
 
-            n_queue = len(self.matchmaking._queue)
-            plog(f"\nPlayers in queue ({n_queue}):")
-            for entry in self.matchmaking._queue:
-                plog(
-                    f"\t{entry.user.username} [{entry.player_id}]"
-                    f" since {entry.in_queue_since}",
-                )
+        lines.append("\nMatch quality scores:")
+        best_scores = heapq.nlargest(
+            config.get_config().monitor_max_pairs,
+            self.matchmaking._match_quality_scores.items(),
+            key=lambda item: item[1],
+        )
+        for (u1, u2), score in best_scores:
+            lines.append(f"\t{u1} vs {u2}: {score:0.4f}")
 
-            plog("\nMatch quality scores:")
-            for (u1, u2), score in self.matchmaking._match_quality_scores.items():
-                plog(f"\t{u1} vs {u2}: {score:0.4f}")
+        lines.append("\nEND\n")
 
-            plog("\nEND")
+        # Write to a temporary file first and then replace the monitor file with it, so
+        # readers never see a partially written file.
+        tmp_path = self._monitor_log_path.with_name(
+            self._monitor_log_path.name + ".tmp"
+        )
+        tmp_path.write_text("\n".join(lines))
+        os.replace(tmp_path, self._monitor_log_path)
 
     def _score_decay(self) -> None:
         """Reduce the score of users who didn't play a game recently."""
@@ -176,26 +242,30 @@ class Server(IServer):
                 log.info("Skip score decay (no games played).")
                 return
 
-            # get all users who didn't play in the last interval and who aren't at the
-            # maximum sigma already
-            stmt = sa.select(User).where(
-                User.sigma < DEFAULT_SIGMA,
-                ~sa.exists().where(
-                    Game.start_time >= cutoff,
-                    sa.or_(Game.user1 == User.user_id, Game.user2 == User.user_id),
-                ),
-            )
-            inactive_users = session.scalars(stmt).all()
-
-            for user in inactive_users:
-                new_sigma = min(user.sigma + conf.score_decay.delta, DEFAULT_SIGMA)
-                UserData.update_rating(
-                    session,
-                    user=user,
-                    mu=user.mu,
-                    sigma=new_sigma,
-                    game_id=None,
+            # Increase sigma of all users who didn't play in the last interval and who
+            # aren't at the maximum sigma already.  This is done with a single UPDATE
+            # statement, which returns the new ratings for the change log.
+            delta = conf.score_decay.delta
+            stmt = (
+                sa.update(User)
+                .where(
+                    User.sigma < DEFAULT_SIGMA,
+                    ~sa.exists().where(
+                        Game.start_time >= cutoff,
+                        sa.or_(Game.user1 == User.user_id, Game.user2 == User.user_id),
+                    ),
                 )
+                .values(sigma=sa.func.min(User.sigma + delta, DEFAULT_SIGMA))
+                .returning(User.user_id, User.username, User.mu, User.sigma)
+            )
+            inactive_users = session.execute(
+                stmt, execution_options={"synchronize_session": False}
+            ).all()
+
+            UserData.log_rating_changes(
+                session,
+                [(user.user_id, user.mu, user.sigma) for user in inactive_users],
+            )
 
             session.commit()
 
@@ -207,9 +277,12 @@ class Server(IServer):
             )
 
 
-def load_class(module_path: str, class_name: str):
-    """
-    Loads a a class from a module.
+@functools.lru_cache(maxsize=32)
+def _load_class_cached(module_path: str, mtime_ns: int, class_name: str):
+    """Load a class from a module (cached, see :func:`load_class`).
+
+    ``mtime_ns`` is not used directly but is part of the cache key, so that the module
+    is loaded again if the file is modified.
     """
     # get the module name by splitting the path and removing the file extension
     name = module_path.split(os.sep)[-1].split(".")[0]
@@ -239,6 +312,22 @@ def load_class(module_path: str, class_name: str):
     return getattr(module, class_name)
 
 
+def load_class(module_path: str, class_name: str):
+    """
+    Loads a a class from a module.
+
+    The result is cached, so loading the same class again only executes the module
+    again if the file has been modified in the meantime.
+    """
+    module_path = os.path.abspath(module_path)
+    try:
+        mtime_ns = os.stat(module_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    return _load_class_cached(module_path, mtime_ns, class_name)
+
+
 def signal_reload_config(signal_num, stack_frame):
     """Signal handler to reload config."""
     config.reload_config()
@@ -259,20 +348,23 @@ def main() -> int:
         log.error("Failed to load config: %s", e)
         return 1
 
-    # set up logging
-    logging.basicConfig(
-        level=conf.log_level,
-        format="[%(asctime)s|%(name)s|%(levelname)s] %(message)s",
+    # set up logging.  Records are buffered and written in batches, so bursts of log
+    # messages (e.g. many players connecting) don't cause one write per message.
+    # Errors are written immediately.
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter("[%(asctime)s|%(name)s|%(levelname)s] %(message)s")
     )
+    log_handler = BatchingStreamHandler(stream_handler)
+    logging.basicConfig(level=conf.log_level, handlers=[log_handler])
+    # make sure buffered messages show up within a second
+    LoopingCall(log_handler.flush).start(1.0, now=False)
 
-    # resolve relative game_path w.r.t. current working directory
-    absolute_game_path = os.path.join(os.getcwd(), conf.game_path)
-
-    # try to load the game class
-    game_type = load_class(absolute_game_path, conf.game_class)
+    # try to load the game class (game_path is already absolute, see load_config)
+    game_type = load_class(str(conf.game_path), conf.game_class)
     # check if the class could be loaded
     if game_type is None:
-        log.error(f"Could not load game class from {absolute_game_path}")
+        log.error("Could not load game class from %s", conf.game_path)
         return 1
     # check if the class is fully implemented
     if inspect.isabstract(game_type):
@@ -4,7 +4,7 @@ import dataclasses
 import logging
 import pathlib
 import os
-from typing import Optional
+from typing import Optional, TypeVar
 
 try:
     import tomllib  # type: ignore[import-not-found]
@@ -18,8 +18,10 @@ import variconf
 
 log = logging.getLogger("comprl.config")
 
+T = TypeVar("T")
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(frozen=True, slots=True)
 class ScoreDecayConfig:
     """Settings for score decay.
 
@@ -34,7 +36,7 @@ class ScoreDecayConfig:
     delta: float = 0.5
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class MatchmakingConfig:
     """Settings for matchmaking.
 
@@ -54,7 +56,7 @@ class MatchmakingConfig:
     max_parallel_games: int = 100
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class Config:
     """Configuration settings."""
 
@@ -78,6 +80,10 @@ class Config:
     #: File to which monitoring information is written.  Ideally use a in-memory file
     #: (e.g. in /dev/shm).
     monitor_log_path: Optional[pathlib.Path] = None
+    #: Maximum number of match quality scores written to the monitor file (only the
+    #: highest scores are written, as the number of pairs grows quadratically with the
+    #: number of players in the queue).
+    monitor_max_pairs: int = 50
 
     #: Key that has to be specified to register
     registration_key: str = ""
@@ -94,6 +100,8 @@ class Config:
 
 
 _config_file: str | os.PathLike | None = None
+# (mtime, size) of the config file when it was last loaded
+_config_file_stat: tuple[int, int] | None = None
 _config: Config | None = None
 
 
@@ -111,6 +119,12 @@ def set_config(config: Config):
     _config = config
 
 
+def _stat_config_file(config_file: str | os.PathLike) -> tuple[int, int]:
+    """Get (mtime, size) of the config file to detect changes."""
+    st = os.stat(config_file)
+    return st.st_mtime_ns, st.st_size
+
+
 def _load_config(
     config_file: str | os.PathLike, dotlist_overwrites: list[str] | None = None
 ) -> Config:
@@ -128,21 +142,35 @@ def _load_config(
     _config = wconf.load_dict(config_from_file).load_dotlist(dotlist_overwrites)
     config = Config(**_config.get())  # type: ignore[arg-type]
 
-    # resolve relative paths w.r.t config file location
+    # resolve relative paths w.r.t config file location, so the rest of the code only
+    # has to deal with absolute paths
     config_file_dir = config_file.parent
-    config.game_path = config_file_dir / config.game_path
-    config.database_path = config_file_dir / config.database_path
-    config.data_dir = config_file_dir / config.data_dir
+    return dataclasses.replace(
+        config,
+        game_path=(config_file_dir / config.game_path.expanduser()).resolve(),
+        database_path=(config_file_dir / config.database_path.expanduser()).resolve(),
+        data_dir=(config_file_dir / config.data_dir.expanduser()).resolve(),
+    )
 
-    return config
+
+def _load_section(values: dict, cls: type[T]) -> T:
+    """Create the config of a single section from the values given in the file.
+
+    Only this section is validated (against ``cls``), which is much cheaper than
+    loading the whole config.  Settings that are not given are set to their defaults.
+    """
+    section = omegaconf.OmegaConf.merge(omegaconf.OmegaConf.structured(cls), values)
+    return omegaconf.OmegaConf.to_object(section)  # type: ignore[return-value]
 
 
 def load_config(
     config_file: str | os.PathLike, dotlist_overwrites: list[str] | None = None
 ) -> Config:
     """Load config from config file and optional dotlist overwrites."""
-    global _config_file
+    global _config_file, _config_file_stat
     _config_file = config_file
+    # stat before loading, so a modification while loading is not missed on reload
+    _config_file_stat = _stat_config_file(config_file)
 
     config = _load_config(config_file, dotlist_overwrites)
     set_config(config)
@@ -159,16 +187,36 @@ def reload_config():
     - If some of the affected settings have been set via dotlist overwrites when
       starting the server, those settings will be lost and replaced by the values from
       the config file.  So hot-reloading and dotlist overwrites should not be combined!
+    - The file is only parsed again if its modification time or size changed since it
+      was last loaded.
     """
+    global _config_file_stat
+
     if _config_file is None:
         log.error("No config file specified, cannot reload config.")
         return
 
-    log.info("Reloading configuration from %s", _config_file)
-    new_config = _load_config(_config_file)
-    current_config = get_config()
+    file_stat = _stat_config_file(_config_file)
+    if file_stat == _config_file_stat:
+        log.info("Configuration file %s is unchanged, skip reload.", _config_file)
+        return
+    _config_file_stat = file_stat
 
-    # update only the matchmaking and score decay settings (other settings require a
+    log.info("Reloading configuration from %s", _config_file)
+    # load only the matchmaking and score decay settings (other settings require a
     # restart)
-    current_config.matchmaking = new_config.matchmaking
-    current_config.score_decay = new_config.score_decay
+    with open(_config_file, "rb") as f:
+        config_from_file = tomllib.load(f)["comprl"]
+    matchmaking = _load_section(
+        config_from_file.get("matchmaking", {}), MatchmakingConfig
+    )
+    score_decay = _load_section(
+        config_from_file.get("score_decay", {}), ScoreDecayConfig
+    )
+
+    # the config is immutable, so replace the global instance with an updated copy
+    set_config(
+        dataclasses.replace(
+            get_config(), matchmaking=matchmaking, score_decay=score_decay
+        )
+    )
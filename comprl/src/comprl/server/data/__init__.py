@@ -7,6 +7,7 @@ from .models import (
 from .sql_backend import (
     GameData as GameData,
     UserData as UserData,
+    create_engine as create_engine,
     get_session as get_session,
     init_engine as init_engine,
 )
@@ -34,19 +34,37 @@ class User(Base):
     def ranking_order_expression() -> sa.sql.expression.ColumnElement[float]:
         """Get the expression used for ranking users.
 
-        This function can be used in order_by clauses.
+        This function can be used in order_by clauses.  There is an index on this
+        expression, so sorting by it doesn't need to compute the score of all users.
         """
-        return User.mu - 3 * User.sigma
+        # The factor is a literal instead of a bound parameter, as SQLite only uses the
+        # index on the expression, if the query contains exactly the same expression.
+        return User.mu - sa.literal_column("3") * User.sigma
 
     def score(self) -> float:
         """Compute the score of the user."""
         return self.mu - 3 * self.sigma
 
 
+# for sorting users by score (e.g. for the leaderboard)
+sa.Index("ix_users_score", User.ranking_order_expression())
+
+
 class Game(Base):
     """Games."""
 
     __tablename__ = "games"
+    __table_args__ = (
+        # for looking up the games between given users (e.g. in
+        # comprl-hockey-game/select_top_player_games.py)
+        sa.Index("ix_games_user1_user2_end_state", "user1", "user2", "end_state"),
+        # for listing the games of a user, ordered by time (e.g. in the web interface)
+        sa.Index("ix_games_user1_start_time", "user1", "start_time"),
+        sa.Index("ix_games_user2_start_time", "user2", "start_time"),
+        # for per-user statistics
+        sa.Index("ix_games_winner", "winner"),
+        sa.Index("ix_games_disconnected", "disconnected"),
+    )
 
     id: Mapped[int] = mapped_column(init=False, primary_key=True)
     game_id: Mapped[str] = mapped_column(unique=True)
@@ -88,9 +106,20 @@ class RatingChangeLog(Base):
 
 
 def create_database_tables(db_path: str) -> None:
-    """Create the database tables in the given SQLite database."""
+    """Create the database tables in the given SQLite database.
+
+    Can also be run on an existing database, in which case only missing tables and
+    indexes are created.
+    """
     engine = sa.create_engine(f"sqlite:///{db_path}")
     Base.metadata.create_all(engine)
+    # create_all() skips existing tables including their indexes, so indexes that were
+    # added later need to be created explicitly.  IF NOT EXISTS is used instead of
+    # checkfirst, as the latter doesn't detect existing indexes on expressions.
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(sa.schema.CreateIndex(index, if_not_exists=True))
 
 
 def get_one(session: Session, cls: type[Base], ident):
@@ -5,6 +5,7 @@ Implementation of the data access objects for managing game and user data in SQL
 from __future__ import annotations
 
 import itertools
+import logging
 import os
 from datetime import datetime
 from typing import Sequence
@@ -23,14 +24,49 @@ from comprl.server.data.models import (
 )
 from comprl.shared.types import GameID
 
+log = logging.getLogger("comprl.database")
+
 
 _engine: sa.Engine | None = None
 
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Configure new SQLite connections.
+
+    WAL mode appends commits to a log (checkpointed periodically) instead of syncing
+    the database file on every commit and allows reading while another connection
+    writes.  Note that WAL does not work if the database is on a network file system.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # with WAL, NORMAL is still safe against corruption (only the last commits may be
+    # lost on power failure)
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    # larger page cache (64 MB) and memory-mapped reads, so that reads of the games
+    # table (statistics, leaderboard) are mostly served from memory
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    # wait for locks held by other processes (e.g. the web interface)
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+def create_engine(db_path: str | os.PathLike) -> sa.Engine:
+    """Create an engine for the given database file.
+
+    The engine keeps a pool of connections, so it should be created once and then
+    reused for all sessions.
+    """
+    engine = sa.create_engine(f"sqlite:///{db_path}")
+    sa.event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
 def init_engine(db_path: str | os.PathLike):
     """Create global engine using the given path to the database file."""
     global _engine
-    _engine = sa.create_engine(f"sqlite:///{db_path}")
+    _engine = create_engine(db_path)
 
 
 def get_session() -> sa.orm.Session:
@@ -44,6 +80,25 @@ def get_session() -> sa.orm.Session:
 class GameData:
     """Bundles several functions to access/modify game data in the database."""
 
+    #: Games added with :meth:`enqueue` that are not yet written to the database.
+    _pending: list[dict] = []
+    #: Maximum number of pending games.  If reached, the games are written directly.
+    max_pending = 100
+
+    @staticmethod
+    def _to_row(game_result: GameResult) -> dict:
+        return {
+            "game_id": str(game_result.game_id),
+            "user1": game_result.user1_id,
+            "user2": game_result.user2_id,
+            "score1": game_result.score_user_1,
+            "score2": game_result.score_user_2,
+            "start_time": game_result.start_time,
+            "end_state": int(game_result.end_state),
+            "winner": game_result.winner_id,
+            "disconnected": game_result.disconnected_id,
+        }
+
     @staticmethod
     def add(game_result: GameResult) -> None:
         """
@@ -54,20 +109,78 @@ class GameData:
 
         """
         with get_session() as session:
-            game = Game(
-                game_id=str(game_result.game_id),
-                user1=game_result.user1_id,
-                user2=game_result.user2_id,
-                score1=game_result.score_user_1,
-                score2=game_result.score_user_2,
-                start_time=game_result.start_time,
-                end_state=int(game_result.end_state),
-                winner=game_result.winner_id,
-                disconnected=game_result.disconnected_id,
-            )
-            session.add(game)
+            session.execute(sa.insert(Game), [GameData._to_row(game_result)])
             session.commit()
 
+    @staticmethod
+    def enqueue(game_result: GameResult) -> None:
+        """Add a game result to be written to the database with the next :meth:`flush`.
+
+        This allows writing the games of several finished games in one transaction.
+        If :attr:`max_pending` games are pending, they are written directly (if this
+        fails, the error is logged and the games are kept for the next flush).
+
+        Args:
+            game_result: Result of the finished game.
+        """
+        GameData._pending.append(GameData._to_row(game_result))
+        if len(GameData._pending) >= GameData.max_pending:
+            try:
+                GameData.flush()
+            except Exception:
+                log.exception("Failed to write games to the database.")
+
+    @staticmethod
+    def flush() -> None:
+        """Write all pending games (see :meth:`enqueue`) to the database.
+
+        Games are only removed from the queue once they are written.  If writing fails
+        with an error that may succeed later (e.g. a locked database), the error is
+        raised and the games are kept for the next flush.  If the games violate a
+        constraint (e.g. a duplicate game ID), they are written one by one and games
+        that still fail are logged and dropped, so that a single invalid game can not
+        block all others.
+        """
+        if not GameData._pending:
+            return
+
+        rows = list(GameData._pending)
+        try:
+            with get_session() as session:
+                session.execute(sa.insert(Game), rows)
+                session.commit()
+        except sa.exc.IntegrityError:
+            log.warning("Failed to write %d games at once, retry singly.", len(rows))
+            GameData._write_one_by_one(rows)
+        else:
+            # games enqueued in the meantime are appended, so the written ones are
+            # still at the front of the queue
+            del GameData._pending[: len(rows)]
+
+    @staticmethod
+    def _write_one_by_one(rows: list[dict]) -> None:
+        for row in rows:
+            try:
+                with get_session() as session:
+                    session.execute(sa.insert(Game), [row])
+                    session.commit()
+            except sa.exc.IntegrityError:
+                log.exception("Dropping game that can not be written: %s", row)
+            # the row is always the first in the queue (other errors are raised above
+            # and keep the remaining rows queued)
+            GameData._pending.pop(0)
+
+    @staticmethod
+    def discard_pending() -> int:
+        """Discard all pending games without writing them.
+
+        Returns:
+            The number of discarded games.
+        """
+        num_discarded = len(GameData._pending)
+        GameData._pending.clear()
+        return num_discarded
+
     @staticmethod
     def get_all() -> Sequence[Game]:
         """
@@ -110,76 +223,41 @@ def get_user_pair_statistics(
     for user_id1, user_id2 in itertools.combinations(user_ids, 2):
         if user_id1 == user_id2:
             continue
-
-        # base statement to count games between user 1 and 2.  Extended in the following
-        # by adding more filters to count wins, losses and draws.
-        stmt = (
-            sa.select(
-                sa.func.sum(
-                    sa.case(
-                        (
-                            sa.and_(
-                                Game.end_state == GameEndState.WIN,
-                                Game.winner == user_id1,
-                            ),
-                            1,
-                        ),
-                        else_=0,
-                    )
-                ).label("wins"),
-                sa.func.sum(
-                    sa.case(
-                        (
-                            sa.and_(
-                                Game.end_state == GameEndState.WIN,
-                                Game.winner != user_id1,
-                            ),
-                            1,
-                        ),
-                        else_=0,
-                    )
-                ).label("losses"),
-                sa.func.sum(
-                    sa.case(
-                        (
-                            Game.end_state == GameEndState.DRAW,
-                            1,
-                        ),
-                        else_=0,
-                    )
-                ).label("draws"),
-            )
-            .select_from(Game)
-            .filter(
-                sa.or_(
-                    sa.and_(Game.user1 == user_id1, Game.user2 == user_id2),
-                    sa.and_(Game.user1 == user_id2, Game.user2 == user_id1),
-                )
-            )
+        result[(user_id1, user_id2)] = {"wins": 0, "losses": 0, "draws": 0}
+        result[(user_id2, user_id1)] = {"wins": 0, "losses": 0, "draws": 0}
+
+    # count the games between all the given users with a single query (one row per
+    # ordered pair (user1, user2) as stored in the games table) and add the counts to
+    # both directions of the pair
+    is_win = Game.end_state == GameEndState.WIN
+    stmt = (
+        sa.select(
+            Game.user1,
+            Game.user2,
+            sa.func.count().filter(is_win, Game.winner == Game.user1).label("wins1"),
+            sa.func.count().filter(is_win, Game.winner == Game.user2).label("wins2"),
+            sa.func.count().filter(Game.end_state == GameEndState.DRAW).label("draws"),
         )
+        .where(
+            Game.user1.in_(user_ids),
+            Game.user2.in_(user_ids),
+            Game.end_state.in_([GameEndState.WIN, GameEndState.DRAW]),
+        )
+        .group_by(Game.user1, Game.user2)
+    )
+    for user1, user2, wins1, wins2, draws in session.execute(stmt):
+        if user1 == user2:
+            continue
 
-        res = session.execute(stmt).first()
-        if res is None:
-            stats = {
-                "wins": 0,
-                "losses": 0,
-                "draws": 0,
-            }
-        else:
-            stats = {
-                "wins": res.wins or 0,
-                "losses": res.losses or 0,
-                "draws": res.draws or 0,
-            }
-
-        result[(user_id1, user_id2)] = stats
-
-        # add the reverse pair
-        result[(user_id2, user_id1)] = {
-            "wins": stats["losses"],
-            "losses": stats["wins"],
-            "draws": stats["draws"],
-        }
+        stats1 = result[(user1, user2)]
+        stats1["wins"] += wins1
+        stats1["losses"] += wins2
+        stats1["draws"] += draws
+
+        stats2 = result[(user2, user1)]
+        stats2["wins"] += wins2
+        stats2["losses"] += wins1
+        stats2["draws"] += draws
 
     return result
 
@@ -211,10 +289,12 @@ class UserData:
         Returns:
             int: The ID of the newly added user.
         """
+        # hash before opening the session, as hashing is deliberately slow
+        password_hash = hash_password(user_password)
         with get_session() as session:
             user = User(
                 username=user_name,
-                password=hash_password(user_password),
+                password=password_hash,
                 token=user_token,
                 role=user_role.value,
                 mu=user_mu,
@@ -263,11 +343,15 @@ class UserData:
             tuple[float, float]: The mu and sigma values of the user.
         """
         with get_session() as session:
-            user = session.get(User, user_id)
-            if user is None:
-                raise ValueError(f"User with ID {user_id} not found.")
+            # only select the needed columns instead of loading the whole user
+            rating = session.execute(
+                sa.select(User.mu, User.sigma).where(User.user_id == user_id)
+            ).one_or_none()
+
+        if rating is None:
+            raise ValueError(f"User with ID {user_id} not found.")
 
-            return user.mu, user.sigma
+        return rating.mu, rating.sigma
 
     @staticmethod
     def update_rating(
@@ -299,10 +383,11 @@ class UserData:
         _user.sigma = sigma
 
         if game_id is not None:
-            # need to get the database ID of the game (not the UUID one)
+            # need to get the database ID of the game (not the UUID one).  None if the
+            # game could not be written to the database.
             game_db_id = session.execute(
                 sa.select(Game.id).where(Game.game_id == str(game_id))
-            ).scalar_one()
+            ).scalar_one_or_none()
         else:
             game_db_id = None
 
@@ -316,6 +401,37 @@ class UserData:
             )
         )
 
+    @staticmethod
+    def log_rating_changes(
+        session: sa.orm.Session, ratings: Sequence[tuple[int, float, float]]
+    ) -> None:
+        """Log rating changes (not caused by a game) in the rating change log table.
+
+        Only needed if the ratings are updated without :meth:`update_rating` (which
+        already logs the changes).
+
+        Args:
+            session: The database session.
+            ratings: Tuples ``(user_id, mu, sigma)`` with the new ratings.
+        """
+        if not ratings:
+            return
+
+        timestamp = datetime.now()
+        session.execute(
+            sa.insert(RatingChangeLog),
+            [
+                {
+                    "timestamp": timestamp,
+                    "user_id": user_id,
+                    "game_id": None,
+                    "new_mu": mu,
+                    "new_sigma": sigma,
+                }
+                for user_id, mu, sigma in ratings
+            ],
+        )
+
     @staticmethod
     def reset_all_ratings() -> None:
         """Resets the matchmaking parameters of all users."""
@@ -330,6 +446,44 @@ class UserData:
         with get_session() as session:
             return get_ranked_users(session)
 
+    @staticmethod
+    def get_ranked_user_ids() -> Sequence[int]:
+        """Get the IDs of all users ordered by their score.
+
+        Cheaper than :meth:`get_ranked_users` if only the order is needed.
+        """
+        with get_session() as session:
+            stmt = sa.select(User.user_id).order_by(
+                User.ranking_order_expression().desc()
+            )
+            return session.scalars(stmt).all()
+
+    @staticmethod
+    def get_ranking_version() -> tuple:
+        """Get a value that changes whenever the ranking of users may have changed.
+
+        All rating changes are logged in the rating change log, so the ranking can only
+        change if a log entry is added (or the log is reset) or if users are added or
+        deleted.  As SQLite may reuse the ID of a deleted user, the set of users is
+        described by aggregates over their IDs and ratings instead of only the highest
+        ID.  Comparing this value is much cheaper than loading the ranking.
+        """
+        with get_session() as session:
+            row = session.execute(
+                sa.select(
+                    sa.select(sa.func.max(RatingChangeLog.id)).scalar_subquery(),
+                    sa.select(
+                        sa.func.count(),
+                        sa.func.total(User.user_id),
+                        sa.func.total(User.mu),
+                        sa.func.total(User.sigma),
+                    )
+                    .select_from(User)
+                    .subquery(),
+                )
+            ).one()
+        return tuple(row)
+
 
 def hash_password(secret: str) -> bytes:
     """Hash the secret using bcrypt.
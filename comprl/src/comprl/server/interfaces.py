@@ -21,6 +21,9 @@ class IAction:
 class IPlayer(abc.ABC):
     """Interface for a player"""
 
+    # there may be many player instances, so avoid a __dict__ per instance
+    __slots__ = ("id", "user_id", "username", "is_connected")
+
     def __init__(self) -> None:
         self.id: PlayerID = IDGenerator.generate_player_id()
         self.user_id: Optional[int] = None
@@ -161,7 +164,9 @@ class IGame(abc.ABC):
 
                 logging.debug("Save game actions to %s", output_file)
                 with open(output_file, "wb") as f:
-                    pickle.dump(self.game_info, f)
+                    # protocol 5 lets numpy arrays be written without first copying
+                    # them into an intermediate bytes object
+                    pickle.dump(self.game_info, f, protocol=pickle.HIGHEST_PROTOCOL)
             except Exception as e:
                 logging.error(
                     "Error while saving game actions: %s | game_id=%s", e, self.id
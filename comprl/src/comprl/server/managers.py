@@ -38,6 +38,11 @@ class GameManager:
     def __init__(self, game_type: Type[IGame]) -> None:
         self.games: dict[GameID, IGame] = {}
         self.game_type = game_type
+        #: Incremented whenever a game is started or ended (used to detect changes).
+        self.version = 0
+        #: Line describing each active game in the monitor file.  Formatted once when
+        #: the game is started, as it doesn't change while the game is running.
+        self.monitor_lines: dict[GameID, str] = {}
 
         self._log = logging.getLogger("comprl.gamemanager")
 
@@ -53,6 +58,10 @@ class GameManager:
         """
         game = self.game_type(players)
         self.games[game.id] = game
+        self.monitor_lines[game.id] = (
+            f"\t{game.id} {tuple(str(pid) for pid in game.players)}"
+        )
+        self.version += 1
 
         self._log.info(
             "Game started | game_id=%s player1=%s player2=%s",
@@ -82,10 +91,12 @@ class GameManager:
 
             game_result = game.get_result()
             if game_result is not None:
-                GameData.add(game_result)
+                GameData.enqueue(game_result)
             else:
                 self._log.error("Game had no valid result | game_id=%s", game.id)
             del self.games[game.id]
+            del self.monitor_lines[game.id]
+            self.version += 1
 
     def force_game_end(self, player_id: PlayerID):
         """Forces all games, that a player is currently playing, to end.
@@ -128,6 +139,12 @@ class PlayerManager:
     def __init__(self) -> None:
         self.auth_players: dict[PlayerID, tuple[IPlayer, int]] = {}
         self.connected_players: dict[PlayerID, IPlayer] = {}
+        #: Incremented whenever a player is added, authenticated or removed (used to
+        #: detect changes).
+        self.version = 0
+        #: Line describing each connected player in the monitor file.  Only formatted
+        #: when the player is added or authenticated (which sets the username).
+        self.monitor_lines: dict[PlayerID, str] = {}
 
         self._log = logging.getLogger("comprl.playermanager")
 
@@ -142,6 +159,8 @@ class PlayerManager:
             None
         """
         self.connected_players[player.id] = player
+        self.monitor_lines[player.id] = self._format_monitor_line(player)
+        self.version += 1
 
     def auth(self, player_id: PlayerID, token: str) -> bool:
         """
@@ -170,6 +189,8 @@ class PlayerManager:
             # set user_id and name of player
             player.user_id = user.user_id
             player.username = user.username
+            self.monitor_lines[player_id] = self._format_monitor_line(player)
+            self.version += 1
             self._log.info(
                 "Player authenticated | user=%s player_id=%s", user.username, player_id
             )
@@ -177,6 +198,10 @@ class PlayerManager:
 
         return False
 
+    @staticmethod
+    def _format_monitor_line(player: IPlayer) -> str:
+        return f"\t{player.username} [{player.id}]"
+
     def remove(self, player: IPlayer) -> None:
         """
         Removes a player from the manager.
@@ -189,6 +214,8 @@ class PlayerManager:
         """
         if player.id in self.connected_players:
             del self.connected_players[player.id]
+            del self.monitor_lines[player.id]
+            self.version += 1
 
             if player.id in self.auth_players:
                 del self.auth_players[player.id]
@@ -353,11 +380,20 @@ class GaussLeaderboardRater(MatchQualityRater):
         self.scale = scale
         self.sigma_func = sigma_func
 
+        self._ranking_version: tuple | None = None
         self.update_model()
 
     def update_model(self) -> None:
-        """Update the model with the current user ranking."""
-        self.ranked_users = [u.user_id for u in UserData.get_ranked_users()]
+        """Update the model with the current user ranking.
+
+        The ranking is only loaded again if it may have changed since the last update.
+        """
+        ranking_version = UserData.get_ranking_version()
+        if ranking_version == self._ranking_version:
+            return
+        self._ranking_version = ranking_version
+
+        self.ranked_users = list(UserData.get_ranked_user_ids())
 
         # clear cached positions
         self.user_positions: dict[int, int] = {}
@@ -395,6 +431,8 @@ class MatchmakingManager:
 
         # queue storing player info and time they joined the queue
         self._queue: list[QueueEntry] = []
+        #: Incremented whenever the queue changes (used to detect changes).
+        self.version = 0
         # The model used for ranking
         self.model = PlackettLuce()
 
@@ -437,7 +475,7 @@ class MatchmakingManager:
         user_id = self.player_manager.get_user_id(player_id)
         if user_id is None:
             self._log.error(
-                f"Player {player_id} is not authenticated but tried to queue."
+                "Player %s is not authenticated but tried to queue.", player_id
             )
             return
         user = self.player_manager.get_user(user_id)
@@ -454,6 +492,7 @@ class MatchmakingManager:
 
         # check if enough players are waiting
         self._queue.append(QueueEntry(player_id, user, datetime.now()))
+        self.version += 1
 
         self._log.info(
             "Player added to queue | user=%s role=%s player_id=%s",
@@ -471,7 +510,10 @@ class MatchmakingManager:
         Args:
             player_id (PlayerID): The ID of the player to be removed.
         """
+        queue_length = len(self._queue)
         self._queue = [entry for entry in self._queue if (entry.player_id != player_id)]
+        if len(self._queue) != queue_length:
+            self.version += 1
 
     def update(self) -> None:
         """Try to match players in the queue and start games."""
@@ -648,6 +690,16 @@ class MatchmakingManager:
         result = game.get_result()
         # if a player disconnected during the game, simply don't update the ratings
         if result is not None and result.end_state is not GameEndState.DISCONNECTED:
+            # write the pending games (including this one), so that the rating change
+            # log can refer to the game.  Failing to write them must not prevent the
+            # rating update.
+            try:
+                GameData.flush()
+            except Exception:
+                self._log.exception(
+                    "Failed to write games to the database | game_id=%s", game.id
+                )
+
             with get_session() as session:
                 user1 = get_one(session, User, result.user1_id)
                 user2 = get_one(session, User, result.user2_id)
@@ -281,6 +281,8 @@ class COMPPlayer(IPlayer):
         connection (COMPServerProtocol): The networking connection for the player.
     """
 
+    __slots__ = ("connection",)
+
     def __init__(self, connection: COMPServerProtocol) -> None:
         """Initialize the COMPPlayer instance.
 
@@ -449,7 +451,7 @@ def launch_server(
             etc.).
 
     """
-    log.info(f"Launching server on port {port}")
+    log.info("Launching server on port %d", port)
 
     reactor.listenTCP(port, COMPFactory(server))  # type: ignore[attr-defined]
 
@@ -2,6 +2,8 @@
 This module contains utility functions for the server.
 """
 
+import logging
+import logging.handlers
 import uuid
 
 from comprl.shared.types import GameID, PlayerID
@@ -27,3 +29,41 @@ class IDGenerator:
             GameID: obtained id
         """
         return uuid.uuid4()
+
+
+class BatchingStreamHandler(logging.handlers.MemoryHandler):
+    """Logging handler that buffers records and writes them to a stream in batches.
+
+    Records are kept in memory until :meth:`flush` is called (e.g. periodically), the
+    buffer reaches its capacity or a record of level ``flushLevel`` or higher is
+    logged.  All buffered records are then written to the stream of ``target`` with a
+    single write, instead of one write (and flush) per record.
+    """
+
+    def __init__(
+        self,
+        target: logging.StreamHandler,
+        capacity: int = 1024,
+        flushLevel: int = logging.ERROR,
+    ) -> None:
+        super().__init__(capacity, flushLevel=flushLevel, target=target)
+
+    def flush(self) -> None:
+        """Write all buffered records to the target stream."""
+        self.acquire()
+        try:
+            target = self.target
+            if self.buffer and isinstance(target, logging.StreamHandler):
+                try:
+                    target.stream.write(
+                        "".join(
+                            target.format(record) + target.terminator
+                            for record in self.buffer
+                        )
+                    )
+                    target.flush()
+                except Exception:
+                    self.handleError(self.buffer[0])
+                self.buffer.clear()
+        finally:
+            self.release()
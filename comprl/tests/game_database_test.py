@@ -5,7 +5,8 @@ from sqlalchemy.exc import IntegrityError
 
 from comprl.server.util import IDGenerator
 from comprl.server.data.interfaces import GameEndState, GameResult
-from comprl.server.data import GameData, init_engine
+from comprl.server.data import GameData, get_session, init_engine
+from comprl.server.data.sql_backend import get_user_pair_statistics
 from comprl.server.data.models import create_database_tables
 
 
@@ -79,3 +80,96 @@ def test_game_data(tmp_path):
     assert len(GameData.get_all()) == 4
 
     # TODO check the data returned by get_all
+
+
+def test_game_data_enqueue(tmp_path):
+    db_file = tmp_path / "database.db"
+    create_database_tables(db_file)
+    init_engine(db_file)
+    GameData.discard_pending()
+
+    for _ in range(3):
+        GameData.enqueue(
+            GameResult(
+                game_id=IDGenerator.generate_game_id(),
+                user1_id=1,
+                user2_id=2,
+                score_user_1=3,
+                score_user_2=6,
+            )
+        )
+
+    # games are only written on flush
+    assert len(GameData.get_all()) == 0
+    GameData.flush()
+    assert len(GameData.get_all()) == 3
+
+    # nothing pending anymore
+    GameData.flush()
+    assert len(GameData.get_all()) == 3
+
+
+def test_game_data_flush_drops_invalid_games(tmp_path):
+    db_file = tmp_path / "database.db"
+    create_database_tables(db_file)
+    init_engine(db_file)
+    GameData.discard_pending()
+
+    def _result(game_id):
+        return GameResult(
+            game_id=game_id, user1_id=1, user2_id=2, score_user_1=3, score_user_2=6
+        )
+
+    duplicate_id = IDGenerator.generate_game_id()
+    GameData.add(_result(duplicate_id))
+
+    # the second game can not be written, as its ID already exists
+    GameData.enqueue(_result(IDGenerator.generate_game_id()))
+    GameData.enqueue(_result(duplicate_id))
+    GameData.enqueue(_result(IDGenerator.generate_game_id()))
+
+    # the invalid game is dropped, the others are written
+    GameData.flush()
+    assert GameData.discard_pending() == 0
+    assert len(GameData.get_all()) == 3
+
+    # later flushes are not blocked
+    GameData.enqueue(_result(IDGenerator.generate_game_id()))
+    GameData.flush()
+    assert len(GameData.get_all()) == 4
+
+
+def test_get_user_pair_statistics(tmp_path):
+    db_file = tmp_path / "database.db"
+    create_database_tables(db_file)
+    init_engine(db_file)
+
+    def add_game(user1, user2, end_state, is_user1_winner=False):
+        GameData.add(
+            GameResult(
+                game_id=IDGenerator.generate_game_id(),
+                user1_id=user1,
+                user2_id=user2,
+                score_user_1=0,
+                score_user_2=0,
+                end_state=end_state,
+                is_user1_winner=is_user1_winner,
+            )
+        )
+
+    add_game(1, 2, GameEndState.WIN, is_user1_winner=True)
+    add_game(2, 1, GameEndState.WIN, is_user1_winner=True)
+    add_game(2, 1, GameEndState.WIN, is_user1_winner=False)
+    add_game(1, 2, GameEndState.DRAW)
+    add_game(1, 2, GameEndState.DISCONNECTED)
+    add_game(1, 3, GameEndState.WIN, is_user1_winner=True)
+
+    with get_session() as session:
+        stats = get_user_pair_statistics(session, [1, 2, 3])
+
+    assert stats[(1, 2)] == {"wins": 2, "losses": 1, "draws": 1}
+    assert stats[(2, 1)] == {"wins": 1, "losses": 2, "draws": 1}
+    assert stats[(1, 3)] == {"wins": 1, "losses": 0, "draws": 0}
+    assert stats[(3, 1)] == {"wins": 0, "losses": 1, "draws": 0}
+    assert stats[(2, 3)] == {"wins": 0, "losses": 0, "draws": 0}
+    assert stats[(3, 2)] == {"wins": 0, "losses": 0, "draws": 0}
@@ -1,7 +1,19 @@
+import time
+
 import pytest
+import sqlalchemy as sa
 
-from comprl.server.data import User, UserData, get_session, init_engine
-from comprl.server.data.models import create_database_tables
+from comprl.server import config
+from comprl.server.__main__ import Server
+from comprl.server.data import GameData, User, UserData, get_session, init_engine
+from comprl.server.data.interfaces import GameResult
+from comprl.server.data.models import (
+    DEFAULT_SIGMA,
+    RatingChangeLog,
+    create_database_tables,
+)
+from comprl.server.interfaces import IGame
+from comprl.server.util import IDGenerator
 
 
 def set_matchmaking_parameters(user_id: int, mu: float, sigma: float) -> None:
@@ -52,3 +64,85 @@ def test_user_data(tmp_path):
     # user1 was updated above
     assert pytest.approx(mu1) == 23.0
     assert pytest.approx(sigma1) == 3.0
+
+
+def test_score_decay(tmp_path, monkeypatch):
+    db_file = tmp_path / "database.db"
+    create_database_tables(db_file)
+    init_engine(db_file)
+
+    monkeypatch.setattr(
+        config,
+        "_config",
+        config.Config(score_decay=config.ScoreDecayConfig(enabled=True, delta=0.5)),
+    )
+
+    user_ids = [
+        UserData.add(user_name=f"player_{i}", user_password="pass", user_token=f"t{i}")
+        for i in range(5)
+    ]
+    set_matchmaking_parameters(user_id=user_ids[0], mu=25.0, sigma=3.0)
+    set_matchmaking_parameters(user_id=user_ids[1], mu=25.0, sigma=3.0)
+    set_matchmaking_parameters(user_id=user_ids[2], mu=20.0, sigma=3.0)
+    set_matchmaking_parameters(user_id=user_ids[3], mu=20.0, sigma=DEFAULT_SIGMA - 0.1)
+    # user 4 keeps the default sigma
+
+    # users 0 and 1 played a game after the cutoff
+    GameData.add(
+        GameResult(
+            game_id=IDGenerator.generate_game_id(),
+            user1_id=user_ids[0],
+            user2_id=user_ids[1],
+            score_user_1=3,
+            score_user_2=6,
+        )
+    )
+
+    server = Server(IGame)
+    server._last_score_decay = time.time() - 3600
+    server._score_decay()
+
+    assert UserData.get_rating(user_ids[0]) == pytest.approx((25.0, 3.0))
+    assert UserData.get_rating(user_ids[1]) == pytest.approx((25.0, 3.0))
+    assert UserData.get_rating(user_ids[2]) == pytest.approx((20.0, 3.5))
+    # sigma is capped at the default value
+    assert UserData.get_rating(user_ids[3]) == pytest.approx((20.0, DEFAULT_SIGMA))
+    assert UserData.get_rating(user_ids[4]) == pytest.approx((25.0, DEFAULT_SIGMA))
+
+    # only the actually changed ratings are logged
+    with get_session() as session:
+        logged_changes = session.execute(
+            sa.select(
+                RatingChangeLog.user_id,
+                RatingChangeLog.game_id,
+                RatingChangeLog.new_mu,
+                RatingChangeLog.new_sigma,
+            ).order_by(RatingChangeLog.user_id)
+        ).all()
+    assert [tuple(c) for c in logged_changes] == [
+        (user_ids[2], None, 20.0, 3.5),
+        (user_ids[3], None, 20.0, pytest.approx(DEFAULT_SIGMA)),
+    ]
+
+
+def test_ranking_version_changes_when_user_id_is_reused(tmp_path):
+    db_file = tmp_path / "database.db"
+    create_database_tables(db_file)
+    init_engine(db_file)
+
+    user_ids = [
+        UserData.add(user_name=f"player_{i}", user_password="pass", user_token=f"t{i}")
+        for i in range(3)
+    ]
+    set_matchmaking_parameters(user_id=user_ids[-1], mu=30.0, sigma=3.0)
+    version = UserData.get_ranking_version()
+    assert UserData.get_ranking_version() == version
+
+    # SQLite reuses the ID of the deleted user for the new one
+    with get_session() as session:
+        session.delete(session.get(User, user_ids[-1]))
+        session.commit()
+    new_user_id = UserData.add(user_name="new", user_password="pass", user_token="tn")
+    assert new_user_id == user_ids[-1]
+
+    assert UserData.get_ranking_version() != version